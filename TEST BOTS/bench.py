@@ -0,0 +1,266 @@
+"""Офлайн нагрузочный тест ботов: синтетические апдейты прогоняются через Dispatcher.
+
+Bot API подменяется фейковой сессией, GamerPower — локальной заглушкой, файлы состояния
+(SQLite, логи) создаются во временной папке.
+
+    python bench.py guess --users 1000 100000 1000000
+    python bench.py echo games --users 1000 --concurrency 200
+
+Печатает апдейты в секунду, p50/p95/p99 задержки хэндлеров и память на пользователя.
+Каждый замер запускается в отдельном процессе, чтобы память не копилась между прогонами.
+"""
+import argparse
+import asyncio
+import datetime
+import importlib.util
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from pathlib import Path
+from typing import Iterator
+
+from aiogram.client.session.base import BaseSession
+from aiogram.types import Chat, Message, Update
+from aiohttp import web
+
+HERE = Path(__file__).resolve().parent
+BOTS = {
+    "echo": "echo.py",
+    "guess": "bot_guess_the_number.py",
+    "games": "bot+FREE_GAMES_API.py",
+}
+STUB_PORT = 8765
+
+
+class FakeSession(BaseSession):
+    """Сессия без сети: каждый метод Bot API сразу возвращает правдоподобный ответ"""
+
+    def __init__(self, latency: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.calls = 0
+
+    async def make_request(self, bot, method, timeout=None):
+        self.calls += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if method.__returning__ is Message:
+            chat_id = getattr(method, "chat_id", 0)
+            return Message(
+                message_id=self.calls,
+                date=datetime.datetime.now(),
+                chat=Chat(id=chat_id if isinstance(chat_id, int) else 0, type="private"),
+                text=getattr(method, "text", None),
+            )
+        return True
+
+    async def stream_content(self, url, headers=None, timeout=30, chunk_size=65536, raise_for_status=True):
+        yield b""
+
+    async def close(self):
+        pass
+
+
+def make_update(update_id: int, user_id: int, text: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": 0,
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+            "text": text,
+        },
+    })
+
+
+def scenario(bot_name: str) -> list[str]:
+    """Типичная сессия одного пользователя"""
+    if bot_name == "guess":
+        return ["/start", "да", *map(str, random.sample(range(1, 101), 5)), "/stat"]
+    if bot_name == "games":
+        return ["/start", "/info"]
+    return ["/start", "привет", "/help"]
+
+
+def updates(bot_name: str, users: int) -> Iterator[tuple[int, int, str]]:
+    """(update_id, user_id, text) — пользователи перемешаны, как в реальном потоке"""
+    update_id = 0
+    steps = [scenario(bot_name) for _ in range(min(users, 1000))]
+    for step in range(max(map(len, steps))):
+        for user_id in range(1, users + 1):
+            texts = steps[user_id % len(steps)]
+            if step < len(texts):
+                update_id += 1
+                yield update_id, user_id, texts[step]
+
+
+async def start_gamerpower_stub(games: int) -> web.AppRunner:
+    payload = [
+        {
+            "id": i,
+            "type": "Game",
+            "title": f"Synthetic Game {i}",
+            "worth": "$9.99",
+            "description": "Lorem ipsum dolor sit amet " * 8,
+            "status": "Active",
+            "end_date": "2030-01-01 00:00:00",
+            "open_giveaway_url": f"https://example.com/open/{i}",
+            "gamerpower_url": f"https://example.com/{i}",
+            "platforms": "PC, Epic Games Store",
+        }
+        for i in range(games)
+    ]
+
+    async def handler(request):
+        return web.json_response(payload)
+
+    app = web.Application()
+    app.router.add_get("/api/giveaways", handler)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", STUB_PORT).start()
+    return runner
+
+
+def load_bot(bot_name: str) -> types.ModuleType:
+    if "config" not in sys.modules:
+        try:
+            import config  # noqa: F401
+        except ImportError:
+            config = types.ModuleType("config")
+            config.BOT_TOKEN = "123456:BENCHMARK"
+            config.ADMIN_CHAT_ID = 1
+            sys.modules["config"] = config
+    sys.path.insert(0, str(HERE))
+    spec = importlib.util.spec_from_file_location(f"bench_{bot_name}", HERE / BOTS[bot_name])
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+async def run_once(bot_name: str, users: int, concurrency: int, api_latency: float,
+                   games: int, trace_memory: bool) -> dict:
+    stub = await start_gamerpower_stub(games) if bot_name == "games" else None
+    module = load_bot(bot_name)
+    bot, dp = module.bot, module.dp
+    bot.session = FakeSession(api_latency)
+    if bot_name == "games":
+        for source in module.poller.sources:
+            source.url = source.url.replace("https://www.gamerpower.com", f"http://127.0.0.1:{STUB_PORT}")
+
+    await dp.emit_startup(bot=bot)
+    if trace_memory:
+        tracemalloc.start()
+    mem_before = tracemalloc.get_traced_memory()[0] if trace_memory else resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    latencies: list[float] = []
+    semaphore = asyncio.Semaphore(concurrency)
+    pending: set[asyncio.Task] = set()
+
+    async def handle(update: Update):
+        try:
+            t = time.perf_counter()
+            await dp.feed_update(bot, update)
+            latencies.append(time.perf_counter() - t)
+        finally:
+            semaphore.release()
+
+    started = time.perf_counter()
+    for update_id, user_id, text in updates(bot_name, users):
+        await semaphore.acquire()
+        task = asyncio.create_task(handle(make_update(update_id, user_id, text)))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    if pending:
+        await asyncio.gather(*pending)
+    elapsed = time.perf_counter() - started
+
+    if trace_memory:
+        mem_after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+    else:
+        mem_after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    await dp.emit_shutdown(bot=bot)
+    if stub is not None:
+        await stub.cleanup()
+
+    return {
+        "bot": bot_name,
+        "users": users,
+        "updates": len(latencies),
+        "updates_per_sec": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "bytes_per_user": max(0, mem_after - mem_before) / users,
+        "api_calls": bot.session.calls,
+        # отброшенные шлюзом (ingress.py) апдейты тоже попадают в updates — их надо видеть
+        "dropped": sum(dp["ingress"].dropped.values()) if "ingress" in dp.workflow_data else 0,
+    }
+
+
+def run_single(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        os.chdir(tmp)  # SQLite и bot.log — во временной папке
+        return asyncio.run(run_once(args.bots[0], args.users[0], args.concurrency,
+                                    args.api_latency, args.games, args.trace_memory))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("bots", nargs="+", choices=sorted(BOTS))
+    parser.add_argument("--users", nargs="+", type=int, default=[1000])
+    parser.add_argument("--concurrency", type=int, default=100, help="одновременно обрабатываемых апдейтов")
+    parser.add_argument("--api-latency", type=float, default=0.0, help="искусственная задержка Bot API, сек")
+    parser.add_argument("--games", type=int, default=50, help="раздач в заглушке GamerPower")
+    parser.add_argument("--trace-memory", action="store_true", help="точная память через tracemalloc (медленнее)")
+    parser.add_argument("--json", action="store_true", help="вывести результаты в JSON")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.single:
+        print(json.dumps(run_single(args)))
+        return
+
+    results = []
+    for bot_name in args.bots:
+        for users in args.users:
+            cmd = [sys.executable, __file__, bot_name, "--users", str(users), "--single",
+                   "--concurrency", str(args.concurrency), "--api-latency", str(args.api_latency),
+                   "--games", str(args.games)]
+            if args.trace_memory:
+                cmd.append("--trace-memory")
+            out = subprocess.run(cmd, capture_output=True, text=True, cwd=HERE,
+                                 env={**os.environ, "PYTHONPATH": os.pathsep.join(sys.path)})
+            if out.returncode != 0:
+                print(out.stderr, file=sys.stderr)
+                sys.exit(out.returncode)
+            results.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"{'bot':<6} {'users':>9} {'updates':>9} {'upd/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'B/user':>8} {'dropped':>8}")
+    for r in results:
+        print(f"{r['bot']:<6} {r['users']:>9} {r['updates']:>9} {r['updates_per_sec']:>9.0f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {r['bytes_per_user']:>8.0f} {r.get('dropped', 0):>8}")
+
+
+if __name__ == "__main__":
+    main()
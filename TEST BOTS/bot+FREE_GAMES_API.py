@@ -1,114 +1,149 @@
 # https://www.gamerpower.com/api-read
 
+from startup import profiler, warm_up  # первым — отсчёт времени холодного старта
+
 import logging
 import asyncio
-import aiohttp
+import html
 from aiogram import Bot, Dispatcher
 from aiogram.filters import Command
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton # for buttons
-import json
-from pathlib import Path
+from aiogram.types import InlineQuery, InlineQueryResultArticle, InputTextMessageContent
 
 from config import BOT_TOKEN, ADMIN_CHAT_ID
-
-
-KNOWN_FILE = "known_giveaways.json"
+from launcher import run_bot, setting
+from log_setup import setup_logging
+from http_client import HttpClient
+from giveaway_cache import CachedGiveaways, GiveawayCache
+from giveaway_diff import ADDED, CHANGED, EXPIRED, Change, SnapshotDiff, is_expired
+from giveaway_filter import GiveawayFilter
+from giveaway_poller import GiveawayPoller, Source
+from giveaway_store import SqliteSeenStore, keep_fresh
+from giveaway_images import CAPTION_LIMIT, FileIdStore, PhotoCards, make_card
+from giveaway_search import SearchIndex
+from broadcast import BroadcastStore, Broadcaster
+from render import PageBook, paginate, send_pages
+from ingress import setup_ingress
+
+profiler.mark("imports")
+
+
+KNOWN_FILE = "known_giveaways.json"  # старый формат, переносится в базу при первом запуске
+KNOWN_DB = "known_giveaways.sqlite3"
+KNOWN_TTL = 180 * 24 * 3600  # через полгода после последнего появления в API id раздачи можно забыть
+FILTERS_FILE = "filters.json"  # необязательный файл с правилами фильтра, перечитывается на лету
 CHECK_INTERVAL = 3600  # 1 час
-
-
-class ColorFormatter(logging.Formatter):
-    RED = "\033[91m"
-    YELLOW = "\033[93m"
-    RESET = "\033[0m"
-
-    def format(self, record):
-        color = self.RESET
-        if record.levelno >= logging.ERROR:
-            color = self.RED
-        elif record.levelno >= logging.WARNING:
-            color = self.YELLOW
-
-        message = super().format(record)
-        return f"{color}{message}{self.RESET}"
-
-
-file_handler = logging.FileHandler("bot.log", encoding="utf-8")
-file_handler.setLevel(logging.WARNING)  # Только WARNING и выше
-
-stream_handler = logging.StreamHandler()
-stream_handler.setLevel(logging.INFO)  # INFO и выше в консоль
-
-# Настраиваем формат
-file_formatter = logging.Formatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s")
-color_formatter = ColorFormatter("%(asctime)s | %(levelname)s | %(name)s | %(message)s")
-file_handler.setFormatter(file_formatter)
-stream_handler.setFormatter(color_formatter)
-
-# Настраиваем корневой логгер
-logging.basicConfig(level=logging.INFO, handlers=[file_handler, stream_handler])
+# платформы GamerPower и период опроса каждой (steam, gog, itchio, ...)
+PLATFORMS = {
+    "epic-games-store": CHECK_INTERVAL,
+}
+POLL_CONCURRENCY = 4  # сколько источников опрашиваем одновременно
+BROADCAST_DB = "broadcast.sqlite3"  # подписчики и состояние рассылок
+BROADCAST_RATE = 30  # глобальный лимит Telegram, сообщений в секунду
+HTTP_TIMEOUT = 10  # секунд на запрос
+HTTP_RETRIES = 3  # попыток при сетевых ошибках и 5xx
+INFO_CACHE_TTL = 300  # сколько секунд /info отвечает из кэша
+GIVEAWAY_CARDS = True  # раздачи — карточками с картинкой (False — только текст)
+INFO_CARDS_MAX = 5  # /info шлёт карточки, только если раздач не больше, иначе — текстом
+IMAGES_DB = "giveaway_images.sqlite3"  # file_id загруженных картинок по id раздачи
+IMAGE_CONCURRENCY = 4  # сколько картинок скачиваем одновременно
+INLINE_CACHE_TIME = 300  # сколько секунд Telegram может кэшировать ответ на inline-запрос
+INGRESS_QUEUE = 500  # апдейтов в обработке, дальше лишнее отбрасывается (кроме админа)
+INGRESS_RATE = 1  # апдейтов в секунду на пользователя
+INGRESS_BURST = 5
+
+
+# Логи пишутся в фоновом потоке; в файл — только WARNING и выше, в консоль — INFO и выше
+setup_logging(
+    fmt="%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    file_level=logging.WARNING,
+    console_level=logging.INFO,
+    color=True,
+    json_output=setting("LOG_JSON", False),
+)
 
 
 bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
+# повторные /info, флуд и перегрузка отсекаются до хэндлеров; команды админа проходят всегда
+setup_ingress(dp, max_queue=INGRESS_QUEUE, rate=INGRESS_RATE, burst=INGRESS_BURST,
+              admins={ADMIN_CHAT_ID, *setting("ADMINS", ())})
+
+# одна сессия на всё время жизни бота
+http_client = HttpClient(timeout=HTTP_TIMEOUT, retries=HTTP_RETRIES)
+
+# картинка каждой раздачи скачивается и загружается один раз, дальше — по file_id
+image_store = FileIdStore(IMAGES_DB)
+cards = PhotoCards(bot, http_client, image_store, concurrency=IMAGE_CONCURRENCY)
+
+broadcast_store = BroadcastStore(BROADCAST_DB)
+broadcaster = Broadcaster(bot, broadcast_store, rate=BROADCAST_RATE, card_sender=cards.send)
+
+
+@dp.startup()
+async def on_startup(is_primary: bool = True, metrics=None):
+    global state_loaded
+    await http_client.start()
+    await image_store.load()
+    if metrics is not None:
+        poller.on_poll = metrics.observe_upstream
+    if not is_primary:
+        # в остальных webhook-процессах фоновые задачи не нужны — их выполняет первый
+        return
+    # известные раздачи читаются из базы в фоне — бот начинает принимать апдейты сразу
+    state_loaded = await warm_up("known_giveaways", load_state, deferred=setting("STARTUP_DEFERRED", True))
+    background_tasks.add(state_loaded)
+    state_loaded.add_done_callback(background_tasks.discard)
 
-FREE_GAMES_API = "https://www.gamerpower.com/api/giveaways?platform=epic-games-store"
 
+async def load_state():
+    known_giveaways.update(await seen_store.load())
+    logging.info(f"Загружено {len(known_giveaways)} известных раздач")
+    await broadcast_store.subscribe(ADMIN_CHAT_ID)
+    spawn(broadcaster.resume(parse_mode="HTML"))
+    spawn(check_updates())  # запуск фоновой проверки
 
 
+@dp.shutdown()
+async def on_shutdown():
+    tasks = list(background_tasks)
+    for task in tasks:
+        task.cancel()
+    # дать задачам доработать отмену (рассылка сохраняет, кому уже отправлено), пока базы открыты
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await http_client.close()
+    await seen_store.close()
+    await image_store.close()
+    await broadcast_store.close()
 
-async def fetch_free_games():
-    """Получить список раздач из API"""
-    async with aiohttp.ClientSession() as session:
-        async with session.get(FREE_GAMES_API, timeout=10) as resp:
-            if resp.status != 200:
-                logging.error(f"Ошибка при запросе к API: {resp.status}")
-                return []
-            return await resp.json()
-        
-# Filter to identify real Epic Games Store giveaways        
-def is_real_epic_game(game: dict) -> bool:
-    # 1. Только полноценные игры
-    if game.get("type") != "Game":
-        return False
 
-    # # 2. Платформа должна включать Epic Games Store
-    # platforms = game.get("platforms", "").lower()
-    # if "epic games store" not in platforms:
-    #     return False
+async def fetch_free_games():
+    """Получить список раздач со всех платформ (на 304 — без повторной загрузки)"""
+    return await poller.fetch_all()
 
-    # 3. Отсекаем партнёров и мусор
-    blacklist = [
-        "alienware",
-        "dungeonloot",
-        "key",
-        "pack",
-        "dlc",
-        "beta",
-        "early access",
-    ]
 
-    title = game.get("title", "").lower()
-    url = game.get("gamerpower_url", "").lower()
+# Filter to identify real Epic Games Store giveaways
+# Правила по умолчанию: только type == "Game" и без партнёров / мусора (см. FilterRules)
+giveaway_filter = GiveawayFilter(path=FILTERS_FILE)
 
-    for word in blacklist:
-        if word in title or word in url:
-            return False
 
-    return True
+def is_real_epic_game(game: dict) -> bool:
+    return giveaway_filter.match(game)
 
 
 def format_game_info(game):
-    """Форматирование информации об игре"""
-    title = game.get("title", "No title")
-    worth = game.get("worth", "N/A")
+    """Форматирование информации об игре (значения из API экранируются для HTML)"""
+    title = html.escape(str(game.get("title", "No title")))
+    worth = html.escape(str(game.get("worth", "N/A")))
 
     description = game.get("description", "No description")
-    logging.info(f"Описание игры: {description}")
+    logging.debug("Описание игры: %s", description)
+    description = html.escape(str(description))
 
-    status = game.get("status", "N/A")
-    date = game.get("end_date", "N/A")
+    status = html.escape(str(game.get("status", "N/A")))
+    date = html.escape(str(game.get("end_date", "N/A")))
 
-    game_url = game.get("open_giveaway_url", "")
+    game_url = html.escape(str(game.get("open_giveaway_url", "")), quote=True)
     # try:
     #     slug = game_url.split("open/")[-1].split("-epic-games")[0]
     #     game_url = f"https://store.epicgames.com/en-US/browse?q={slug}"
@@ -124,28 +159,69 @@ def format_game_info(game):
     )
 
 
+def format_game_card(game: dict) -> str:
+    """Подпись к карточке: как format_game_info, но описание укорочено под лимит подписи к фото"""
+    text = format_game_info(game).strip()
+    description = str(game.get("description", ""))
+    while len(text) > CAPTION_LIMIT and description:
+        description = description[:max(0, len(description) - (len(text) - CAPTION_LIMIT) - 1)]
+        text = format_game_info({**game, "description": description + "…"}).strip()
+    return text
+
+
 @dp.message(Command("start"))
 async def start_cmd(message: Message):
+    await broadcast_store.subscribe(message.chat.id)
     await message.answer("Привет! Теперь я буду уведомлять тебя о новых бесплатных играх.")
     print(f"Твой chat.id: {message.chat.id}")
 
 
-@dp.message(Command("info"))
-async def send_free_games_info(message: Message):
-    """Команда /info — вручную показывает список бесплатных игр"""
+@dp.message(Command("stop"))
+async def stop_cmd(message: Message):
+    await broadcast_store.unsubscribe(message.chat.id)
+    await message.answer("Больше не буду присылать уведомления. Вернуться — /start")
+
+
+def render_games(games: list[dict], header: str):
+    """Страницы сообщения (не длиннее лимита Telegram) — генератор, игры рендерятся по мере надобности"""
+    return paginate((format_game_info(game) for game in games), header=header)
+
+
+def build_info(raw_games: list[dict]) -> CachedGiveaways:
+    """Отфильтровать раздачи; страницы ответа для /info рендерятся при первом запросе и запоминаются"""
     # Optional: filter to only real Epic Games Store games
-    # games = await fetch_free_games()
-    games = [g for g in await fetch_free_games() if is_real_epic_game(g)]
+    games = giveaway_filter.filter(raw_games)
 
     if not games:
-        await message.answer("🎮 Сейчас нет бесплатных игр в Epic Games Store.")
-        return
+        return CachedGiveaways(games, PageBook(["🎮 Сейчас нет бесплатных игр в Epic Games Store."]))
+
+    return CachedGiveaways(
+        games,
+        PageBook(render_games(games, "🎮 Бесплатные игры сейчас в Epic Games Store:\n\n")),
+        tuple(make_card(game, format_game_card(game)) for game in games) if GIVEAWAY_CARDS else (),
+    )
+
+
+async def load_info() -> CachedGiveaways:
+    # если список изменился, опрос уже передал его в снимок, и подписчик обновил кэш
+    await fetch_free_games()
+    return info_cache.value or build_info(snapshot.games())
 
-    reply_text = "🎮 Бесплатные игры сейчас в Epic Games Store:\n\n"
-    for game in games:
-        reply_text += format_game_info(game)
 
-    await message.answer(reply_text, parse_mode="HTML")
+info_cache = GiveawayCache(load_info, ttl=INFO_CACHE_TTL)
+
+
+@dp.message(Command("info"))
+async def send_free_games_info(message: Message):
+    """Команда /info — вручную показывает список бесплатных игр"""
+    info = await info_cache.get()
+    if info.cards and len(info.cards) <= INFO_CARDS_MAX:
+        # через лимиты рассыльщика: не чаще лимита на чат, flood wait — пауза и повтор, а не ошибка хэндлера
+        header = "🎮 Бесплатные игры сейчас в Epic Games Store:"
+        await broadcaster.send(message.chat.id, [header, *info.cards], parse_mode="HTML")
+        return
+    # первая страница уходит, пока следующие ещё не отрендерены
+    await send_pages(lambda page: message.answer(page, parse_mode="HTML"), info.pages)
 
 
 @dp.message(Command("links"))
@@ -182,78 +258,146 @@ async def links_cmd(message: Message):
     )
 
 
+def build_inline_result(game: dict) -> InlineQueryResultArticle:
+    """Готовый результат inline-поиска — строится один раз, когда раздача попадает в индекс"""
+    return InlineQueryResultArticle(
+        id=str(game.get("id")),
+        title=str(game.get("title", "No title")),
+        description=f"{game.get('worth', 'N/A')} · до {game.get('end_date', 'N/A')}",
+        thumbnail_url=game.get("thumbnail") or None,
+        input_message_content=InputTextMessageContent(message_text=format_game_card(game), parse_mode="HTML"),
+    )
+
+
+# поиск по названию, платформам и описанию; обновляется вместе со снимком раздач
+search_index = SearchIndex(build_inline_result)
+
+
+# inline-режим нужно включить у @BotFather (/setinline)
+@dp.inline_query()
+async def inline_search(query: InlineQuery):
+    """@бот запрос — поиск среди текущих раздач, без обращений к API на каждое нажатие"""
+    if state_loaded is None or not search_index:
+        # опрос идёт только в первом процессе; остальные (webhook-воркеры, шарды) обновляют снимок
+        # и индекс через кэш /info: пока он свежий, это дёшево, по истечении TTL — перезагрузка в фоне
+        await info_cache.get()
+    offset = int(query.offset) if query.offset.isdigit() else 0
+    results, next_offset = search_index.search(query.query, offset=offset)
+    await query.answer(
+        results,
+        cache_time=INLINE_CACHE_TIME,
+        next_offset=str(next_offset) if next_offset is not None else "",
+    )
+
+
 @dp.errors()
 async def global_error_handler(update, exception):
-    logging.error(f"Ошибка: {exception} при обработке {update}")
+    logging.error("Ошибка: %s при обработке %s", exception, update)
     return True  # чтобы бот не упал
 
 
-def load_known_giveaways() -> set[int]:
-    if not Path(KNOWN_FILE).exists():
-        logging.info("Файл known_giveaways.json не найден — стартуем с пустого списка")
-        return set()
+seen_store = SqliteSeenStore(KNOWN_DB, ttl=KNOWN_TTL, legacy_json=KNOWN_FILE)
 
-    try:
-        with open(KNOWN_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            logging.info(f"Загружено {len(data)} известных раздач")
-            return set(data)
-    except Exception as e:
-        logging.error(f"Ошибка чтения {KNOWN_FILE}: {e}")
-        return set()
-    
-# список id раздач, чтобы не повторять уведомления
-known_giveaways = load_known_giveaways()
+# список id раздач, чтобы не повторять уведомления (заполняется при старте)
+known_giveaways: set = set()
+# задача загрузки known_giveaways; None — процесс не рассылает уведомления (не первый webhook-воркер)
+state_loaded: asyncio.Task | None = None
+background_tasks: set[asyncio.Task] = set()
 
-def save_known_giveaways():
-    try:
-        with open(KNOWN_FILE, "w", encoding="utf-8") as f:
-            json.dump(list(known_giveaways), f, indent=2)
-    except Exception as e:
-        logging.error(f"Ошибка записи {KNOWN_FILE}: {e}")
 
+def spawn(coro) -> asyncio.Task:
+    """Фоновая задача, которую отменим при остановке бота"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
 
-async def check_updates():
-    """Фоновая задача — раз в час проверяет новые раздачи"""
-    global known_giveaways
-    while True:
-        logging.info("Проверка обновлений...")
-        games = await fetch_free_games()
-        if not games:
-            await asyncio.sleep(CHECK_INTERVAL)
-            continue
 
-        new_games = []
-        for game in games:
-            # Optional: skip non-Epic games
-            if not is_real_epic_game(game):
-                continue 
+# последний снимок раздач; опрос отдаёт в него каждый новый список, подписчики получают только изменения
+snapshot = SnapshotDiff()
+
 
-            game_id = game.get("id")
-            if game_id not in known_giveaways:
-                known_giveaways.add(game_id)
-                new_games.append(game)
+@snapshot.subscribe
+async def refresh_info(changes: list[Change]):
+    """Кэш /info пересобирается только когда список действительно изменился"""
+    info_cache.put(build_info(snapshot.games()))
 
-        if new_games:
-            text = "🆕 Новые бесплатные игры в Epic Games Store!\n\n"
-            for g in new_games:
-                text += format_game_info(g)
-            try:
-                await bot.send_message(ADMIN_CHAT_ID, text, parse_mode="HTML")
-                save_known_giveaways()
-            except Exception as e:
-                logging.error(f"Ошибка при отправке сообщения: {e}\n{text[:1_000]}")
 
-        await asyncio.sleep(CHECK_INTERVAL) # ждать 1 час (3600 сек)
+@snapshot.subscribe
+async def notify_new(changes: list[Change]):
+    """Уведомления о новых раздачах (и о тех, что после изменения впервые прошли фильтр)"""
+    if state_loaded is None:
+        return
+    # /info мог прийти раньше, чем загрузились известные раздачи
+    await state_loaded
+    new_games = []
+    for change in changes:
+        if change.kind not in (ADDED, CHANGED) or change.id in known_giveaways:
+            continue
+        # Optional: skip non-Epic games
+        if giveaway_filter.match(change.game):
+            known_giveaways.add(change.id)
+            new_games.append(change.game)
+
+    if new_games:
+        if GIVEAWAY_CARDS:
+            pages = ["🆕 Новые бесплатные игры в Epic Games Store!",
+                     *(make_card(game, format_game_card(game)) for game in new_games)]
+        else:
+            pages = list(render_games(new_games, "🆕 Новые бесплатные игры в Epic Games Store!\n\n"))
+        try:
+            # рассылка сохраняется в базе до отправки, поэтому id можно сразу запомнить
+            broadcast_id = await broadcast_store.create(pages)
+            await seen_store.add_many(g.get("id") for g in new_games)
+        except Exception as e:
+            logging.error(f"Ошибка при создании рассылки: {e}\n{str(pages[-1])[:1_000]}")
+            return
+        # рассылка идёт в фоне и не задерживает опрос источников
+        spawn(broadcaster.run(broadcast_id, pages, parse_mode="HTML"))
+
+
+@snapshot.subscribe
+async def log_expired(changes: list[Change]):
+    for change in changes:
+        if change.kind == EXPIRED:
+            logging.info("Раздача закончилась: %s", change.game.get("title"))
+
+
+@snapshot.subscribe
+async def update_search(changes: list[Change]):
+    """Индекс inline-поиска меняется только для изменившихся раздач"""
+    search_index.apply(changes, accept=giveaway_filter.match)
+
+
+@snapshot.subscribe
+async def evict_images(changes: list[Change]):
+    """file_id картинок закончившихся раздач больше не нужны"""
+    removed = await cards.evict(c.id for c in changes if c.kind == EXPIRED)
+    if removed:
+        logging.info("Удалено картинок из кэша: %s", removed)
+
+
+poller = GiveawayPoller(
+    http_client,
+    [Source.platform(name, interval=interval) for name, interval in PLATFORMS.items()],
+    on_update=snapshot.update,
+    concurrency=POLL_CONCURRENCY,
+)
+
+
+def live_known_ids() -> list:
+    """Известные раздачи, которые всё ещё идут, — их срок в базе продлевается"""
+    return [g.get("id") for g in snapshot.games() if g.get("id") in known_giveaways and not is_expired(g)]
 
 
-async def main():
-    """Запуск бота и фоновой проверки"""
-    asyncio.create_task(check_updates())  # запуск фоновой проверки
-    await dp.start_polling(bot)
+async def check_updates():
+    """Фоновая задача — опрашивает все платформы, каждую со своим интервалом"""
+    logging.info("Проверка обновлений...")
+    # раз в цикл опроса база продлевает идущие раздачи и удаляет устаревшие
+    await asyncio.gather(poller.run(), keep_fresh(seen_store, live_known_ids, interval=CHECK_INTERVAL))
 
 
 if __name__ == "__main__":
     logging.info("Бот запущен")
-    asyncio.run(main())
+    run_bot(dp, bot)  # polling или webhook — см. BOT_MODE в config.py; фоновая проверка стартует в on_startup
 
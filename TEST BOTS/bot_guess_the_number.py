@@ -1,44 +1,82 @@
+from startup import profiler  # первым — отсчёт времени холодного старта
+
 import logging
-from aiogram import Bot, Dispatcher, F
-from aiogram.filters import Command, CommandStart
+import random
+from aiogram import Bot, Dispatcher
 from aiogram.types import Message
 
 from config import BOT_TOKEN
+from launcher import run_bot, setting
+from log_setup import setup_logging
+from user_storage import SqliteUserBackend, UserState, UserStorage
+from leaderboard import Leaderboard
+from routing import RoutingTable
+from sequencing import ChatSequencer
+from ingress import setup_ingress, update_text
+
+profiler.mark("imports")
 
-logging.basicConfig(
+setup_logging(
     level=logging.INFO,  # INFO покажет всё важное; DEBUG — для детальной отладки
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.StreamHandler(),                # Вывод в консоль
-        logging.FileHandler("bot.log", encoding="utf-8")  # Запись в файл bot.log
-    ]
+    fmt="%(asctime)s [%(levelname)s] %(message)s",
+    log_file="bot.log",  # консоль + файл bot.log с ротацией, запись в фоновом потоке
+    json_output=setting("LOG_JSON", False),
 )
 
-bot = Bot(token=BOT_TOKEN)
-dp = Dispatcher()
-
 ATTEMPTS = 5
+USERS_DB = "users.sqlite3"
+USERS_CACHE_SIZE = 100_000  # сколько игроков держим в памяти
+USERS_FLUSH_INTERVAL = 5  # раз в сколько секунд сбрасываем изменения в базу
+TOP_SIZE = 10  # сколько строк показывать в /top
+TOP_MIN_GAMES = 5  # минимум игр для рейтинга по проценту побед
+INGRESS_QUEUE = 1000  # апдейтов в обработке, дальше принимаются только ходы в игре
+INGRESS_RATE = 3  # апдейтов в секунду на игрока
+INGRESS_BURST = 10
+
+
+def is_game_move(update) -> bool:
+    text = update_text(update)
+    return text is not None and text.strip().isdigit()
 
-from collections import defaultdict
 
-users: dict = defaultdict(lambda: {
-    'in_game': False,
-    'secret_number': None,
-    'attempts': None,
-    'total_games': 0,
-    'wins': 0
-})
+bot = Bot(token=BOT_TOKEN)
+dp = Dispatcher()
+# Первым — шлюз: дубли, флуд и лишняя нагрузка отбрасываются до хэндлеров; ходы в игре проходят всегда
+setup_ingress(dp, max_queue=INGRESS_QUEUE, rate=INGRESS_RATE, burst=INGRESS_BURST,
+              is_priority=is_game_move, admins=setting("ADMINS", ()))
+# Ходы одного игрока обрабатываются по порядку (без гонок на attempts), разные игроки — параллельно
+dp.update.outer_middleware(ChatSequencer())
+
+# Состояния игроков: горячие — в памяти, все — в SQLite (переживают перезапуск)
+users = UserStorage(SqliteUserBackend(USERS_DB), capacity=USERS_CACHE_SIZE,
+                    flush_interval=USERS_FLUSH_INTERVAL)
+# Таблицы лидеров — в той же базе: порядок хранят её индексы, /top читает только первые строки
+leaderboard = Leaderboard(USERS_DB, min_games=TOP_MIN_GAMES, flush_interval=USERS_FLUSH_INTERVAL)
+# Все текстовые хэндлеры — в одной таблице: текст разбирается один раз, поиск по словарю.
+# user="get" / "peek" — хэндлер получает состояние игрока (peek не создаёт запись для новичка)
+routes = RoutingTable(get_user=users.get, peek_user=users.peek)
+
+
+@dp.startup()
+async def on_startup():
+    await users.start()
+    await leaderboard.start()
+
+
+@dp.shutdown()
+async def on_shutdown():
+    await leaderboard.close()
+    await users.close()
 # logging.info(f"👤 Новый пользователь: {message.from_user.id} ({message.from_user.full_name})")
 
 
 def get_random_number() -> int:
-    import random
     return random.randint(1, 100)
 
 
 # Этот хэндлер будет срабатывать на команду "/start"
-@dp.message(CommandStart()) # or Command(commands='start')
-async def process_start_command(message: Message):
+@routes.command('start')
+async def process_start_command(message: Message, args: str | None = None):
     await message.answer(
         'Привет!\nДавайте сыграем в игру "Угадай число"?\n\n'
         'Чтобы получить правила игры и список доступных '
@@ -47,8 +85,8 @@ async def process_start_command(message: Message):
 
 
 # Этот хэндлер будет срабатывать на команду "/help"
-@dp.message(Command(commands='help'))
-async def process_help_command(message: Message):
+@routes.command('help')
+async def process_help_command(message: Message, args: str | None = None):
     await message.answer(
         'Правила игры:\n\n'
         'Я загадываю число от 1 до 100, а вам нужно его угадать\n' 
@@ -56,26 +94,63 @@ async def process_help_command(message: Message):
         'Доступные команды:\n'
         '/help - правила игры и список команд\n'
         '/cancel - выйти из игры\n'
-        '/stat - посмотреть статистику\n\n'
+        '/stat - посмотреть статистику\n'
+        '/top - таблица лидеров (/top rate, /top day, /top week)\n\n'
         'Давай сыграем?'
     )
 
 
 # Этот хэндлер будет срабатывать на команду "/stat"
-@dp.message(Command(commands='stat'))
-async def process_stat_command(message: Message):
+@routes.command('stat', user='peek')
+async def process_stat_command(message: Message, user: UserState, args: str | None = None):
     await message.answer(
         'Всего игр сыграно: '
-        f'{users[message.from_user.id]["total_games"]}\n'
-        f'Игр выиграно: {users[message.from_user.id]["wins"]}'
+        f'{user.total_games}\n'
+        f'Игр выиграно: {user.wins}'
     )
 
 
+TOP_TITLES = {
+    'wins': 'Лучшие игроки по победам',
+    'rate': f'Лучшие игроки по проценту побед (от {TOP_MIN_GAMES} игр)',
+    'day': 'Лучшие игроки за сегодня',
+    'week': 'Лучшие игроки за неделю',
+}
+
+
+# Этот хэндлер будет срабатывать на команду "/top"
+@routes.command('top')
+async def process_top_command(message: Message, args: str | None = None):
+    name = (args or 'wins').lower()
+    if name not in TOP_TITLES:
+        name = 'wins'
+
+    lines = [f'🏆 {TOP_TITLES[name]}:\n']
+    for place, row in enumerate(await leaderboard.top(name, TOP_SIZE), start=1):
+        player = row.name or f'Игрок {row.user_id}'
+        if name == 'rate':
+            lines.append(f'{place}. {player} — {row.wins / row.games:.0%} ({row.games} игр)')
+        else:
+            lines.append(f'{place}. {player} — побед: {row.wins} (игр: {row.games})')
+    if len(lines) == 1:
+        lines.append('Пока никто не сыграл')
+
+    rank = await leaderboard.rank(name, message.from_user.id)
+    if rank is not None:
+        place, total = rank
+        if place is None:
+            lines.append(f'\nВаше место: дальше {leaderboard.rank_limit}-го из {total}')
+        else:
+            lines.append(f'\nВаше место: #{place} из {total}')
+    await message.answer('\n'.join(lines))
+
+
 # Этот хэндлер будет срабатывать на команду "/cancel"
-@dp.message(Command(commands='cancel'))
-async def process_cancel_command(message: Message):
-    if users[message.from_user.id]['in_game']:
-        users[message.from_user.id]['in_game'] = False
+@routes.command('cancel', user='peek')
+async def process_cancel_command(message: Message, user: UserState, args: str | None = None):
+    if user.in_game:
+        user.in_game = False
+        users.save(message.from_user.id, user)
         # logging.info(f"❌ {message.from_user.id} вышел из игры")
         await message.answer(
             'Вы вышли из игры. Если захотите сыграть '
@@ -89,14 +164,15 @@ async def process_cancel_command(message: Message):
 
 
 # Этот хэндлер будет срабатывать на согласие пользователя сыграть в игру
-@dp.message(F.text.lower().in_(['да', 'давай', 'игра',
-                                'играть', 'хочу', 'yes', 'y', 'ok']))
-async def process_positive_answer(message: Message):
-    if not users[message.from_user.id]['in_game']:
-        users[message.from_user.id]['in_game'] = True
-        users[message.from_user.id]['secret_number'] = get_random_number()
-        users[message.from_user.id]['attempts'] = ATTEMPTS
-        # logging.info(f"🎮 {message.from_user.id} начал игру. Загадано: {users[message.from_user.id]['secret_number']}")
+@routes.text('да', 'давай', 'игра',
+             'играть', 'хочу', 'yes', 'y', 'ok', user='get')
+async def process_positive_answer(message: Message, user: UserState):
+    if not user.in_game:
+        user.in_game = True
+        user.secret_number = get_random_number()
+        user.attempts = ATTEMPTS
+        users.save(message.from_user.id, user)
+        # logging.info(f"🎮 {message.from_user.id} начал игру. Загадано: {user.secret_number}")
 
         await message.answer(
             'Ура!\n\nЯ загадал число от 1 до 100, '
@@ -111,9 +187,9 @@ async def process_positive_answer(message: Message):
 
 
 # Этот хэндлер будет срабатывать на отказ пользователя сыграть в игру
-@dp.message(F.text.lower().in_(['нет', 'не', 'не хочу', 'no', 'n']))
-async def process_negative_answer(message: Message):
-    if not users[message.from_user.id]['in_game']:
+@routes.text('нет', 'не', 'не хочу', 'no', 'n', user='peek')
+async def process_negative_answer(message: Message, user: UserState):
+    if not user.in_game:
         # logging.info(f"🚫 {message.from_user.id} отказался играть")
         await message.answer(
             'Жаль :(\n\n' \
@@ -126,30 +202,37 @@ async def process_negative_answer(message: Message):
 
 
 # Этот хэндлер будет срабатывать на отправку пользователем чисел от 1 до 100
-@dp.message(lambda x: x.text and x.text.isdigit() and 1 <= int(x.text) <= 100)
-async def process_numbers_answer(message: Message):
-    if users[message.from_user.id]['in_game']:
-        if int(message.text) == users[message.from_user.id]['secret_number']:
-            users[message.from_user.id]['in_game'] = False
-            users[message.from_user.id]['total_games'] += 1
-            users[message.from_user.id]['wins'] += 1
+@routes.number(1, 100, user='get')
+async def process_numbers_answer(message: Message, user: UserState, number: int):
+    user_id = message.from_user.id
+    if user.in_game:
+        if number == user.secret_number:
+            user.in_game = False
+            user.total_games += 1
+            user.wins += 1
+            users.save(user_id, user)
+            leaderboard.record(user_id, user, won=True, name=message.from_user.full_name)
             await message.answer(
                 'Ура!!! Вы угадали число!\n\n'
                 'Может, сыграем еще?'
             )
-        elif int(message.text) > users[message.from_user.id]['secret_number']:
-            users[message.from_user.id]['attempts'] -= 1
+        elif number > user.secret_number:
+            user.attempts -= 1
+            users.save(user_id, user)
             await message.answer('Мое число меньше')
-        elif int(message.text) < users[message.from_user.id]['secret_number']:
-            users[message.from_user.id]['attempts'] -= 1
+        elif number < user.secret_number:
+            user.attempts -= 1
+            users.save(user_id, user)
             await message.answer('Мое число больше')
 
-        if users[message.from_user.id]['attempts'] == 0:
-            users[message.from_user.id]['in_game'] = False
-            users[message.from_user.id]['total_games'] += 1
+        if user.attempts == 0:
+            user.in_game = False
+            user.total_games += 1
+            users.save(user_id, user)
+            leaderboard.record(user_id, user, won=False, name=message.from_user.full_name)
             await message.answer(
                 'К сожалению, у вас больше не осталось попыток. Вы проиграли :(\n\n'
-                f'Мое число было {users[message.from_user.id]["secret_number"]}\n\n'
+                f'Мое число было {user.secret_number}\n\n'
                 'Давайте сыграем еще?'
             )
     else:
@@ -157,9 +240,9 @@ async def process_numbers_answer(message: Message):
 
 
 # Этот хэндлер будет срабатывать на остальные любые сообщения
-@dp.message()
-async def process_other_answers(message: Message):
-    if users[message.from_user.id]['in_game']:
+@routes.default(user='peek')
+async def process_other_answers(message: Message, user: UserState):
+    if user.in_game:
         await message.answer(
             'Мы же сейчас с вами играем. Присылайте, пожалуйста, числа от 1 до 100'
         )
@@ -169,8 +252,12 @@ async def process_other_answers(message: Message):
         )
 
 
+# Один хэндлер в Dispatcher — таблица сама выбирает нужную функцию
+dp.message.register(routes.dispatch)
+
+
 if __name__ == '__main__':
-    dp.run_polling(bot)
+    run_bot(dp, bot)  # polling или webhook — см. BOT_MODE в config.py
 # Улучшения, которые можно внести в этого бота
 
 # При перезапуске бота словарь users обнуляется и все состояния всех пользователей, соответственно, сбрасываются. Самое простое решение такой проблемы - периодически сохранять словарь в файл, а потом, при перезапуске бота считывать его из файла. Для этого подойдёт, например, библиотека pickle. Но вообще, такое решение не очень хорошее. Лучше - для хранения состояний пользователей использовать базу данных или FSMContext на базе персистентного хранилища (например, Redis). Об этом мы будем говорить в других уроках.
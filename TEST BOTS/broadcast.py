@@ -0,0 +1,273 @@
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError, TelegramRetryAfter
+
+from sqlite_db import SqliteDB
+
+# ошибки 400, после которых в чат писать бессмысленно; остальные (file_id, подпись, картинка) — про само сообщение
+CHAT_ERRORS = ("chat not found", "user not found", "user is deactivated", "bot was kicked",
+               "not enough rights", "have no rights", "chat_write_forbidden")
+
+
+def is_chat_error(error: TelegramBadRequest) -> bool:
+    """Ошибка про чат (получатель недоступен), а не про отправляемое сообщение"""
+    text = str(error).lower()
+    return any(marker in text for marker in CHAT_ERRORS)
+
+
+class TokenBucket:
+    """Token bucket: не больше rate операций в секунду, всплеск до capacity"""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        async with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+    def pause(self, seconds: float):
+        """После RetryAfter — забрать все токены на seconds вперёд"""
+        self._tokens = -seconds * self.rate
+        self._updated = time.monotonic()
+
+
+class BroadcastStore:
+    """SQLite: подписчики, незавершённые рассылки и кому они уже доставлены"""
+
+    def __init__(self, path: str = "broadcast.sqlite3"):
+        self.path = path
+        self._db = SqliteDB(
+            path,
+            "CREATE TABLE IF NOT EXISTS subscribers (chat_id INTEGER PRIMARY KEY, since REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS broadcasts (id TEXT PRIMARY KEY, messages TEXT NOT NULL,"
+            " created REAL NOT NULL, done INTEGER NOT NULL DEFAULT 0);"
+            "CREATE TABLE IF NOT EXISTS deliveries (broadcast_id TEXT NOT NULL, chat_id INTEGER NOT NULL,"
+            " PRIMARY KEY (broadcast_id, chat_id));",
+        )
+
+    async def subscribe(self, chat_id: int) -> bool:
+        return await asyncio.to_thread(
+            self._db.execute, "INSERT OR IGNORE INTO subscribers VALUES (?, ?)", (chat_id, time.time())
+        ) > 0
+
+    async def unsubscribe(self, chat_id: int) -> bool:
+        return await asyncio.to_thread(
+            self._db.execute, "DELETE FROM subscribers WHERE chat_id = ?", (chat_id,)
+        ) > 0
+
+    async def subscribers_count(self) -> int:
+        rows = await asyncio.to_thread(self._db.fetch, "SELECT COUNT(*) FROM subscribers")
+        return rows[0][0]
+
+    async def create(self, messages: list[str | dict]) -> str:
+        broadcast_id = uuid.uuid4().hex
+        await asyncio.to_thread(
+            self._db.execute, "INSERT INTO broadcasts (id, messages, created) VALUES (?, ?, ?)",
+            (broadcast_id, json.dumps(messages, ensure_ascii=False), time.time()),
+        )
+        return broadcast_id
+
+    async def pending(self) -> list[tuple[str, list[str | dict]]]:
+        rows = await asyncio.to_thread(
+            self._db.fetch, "SELECT id, messages FROM broadcasts WHERE done = 0 ORDER BY created"
+        )
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    async def is_done(self, broadcast_id: str) -> bool:
+        rows = await asyncio.to_thread(self._db.fetch, "SELECT done FROM broadcasts WHERE id = ?", (broadcast_id,))
+        return not rows or bool(rows[0][0])
+
+    async def recipients(self, broadcast_id: str) -> list[int]:
+        """Подписчики, которым эта рассылка ещё не доставлена"""
+        rows = await asyncio.to_thread(
+            self._db.fetch,
+            "SELECT chat_id FROM subscribers WHERE chat_id NOT IN"
+            " (SELECT chat_id FROM deliveries WHERE broadcast_id = ?)",
+            (broadcast_id,),
+        )
+        return [row[0] for row in rows]
+
+    async def mark_delivered(self, broadcast_id: str, chat_ids: list[int]):
+        await asyncio.to_thread(
+            self._db.execute, "INSERT OR IGNORE INTO deliveries VALUES (?, ?)",
+            [(broadcast_id, chat_id) for chat_id in chat_ids], True,
+        )
+
+    async def finish(self, broadcast_id: str):
+        await asyncio.to_thread(self._db.execute, "UPDATE broadcasts SET done = 1 WHERE id = ?", (broadcast_id,))
+        await asyncio.to_thread(self._db.execute, "DELETE FROM deliveries WHERE broadcast_id = ?", (broadcast_id,))
+
+    async def close(self):
+        await self._db.close()
+
+
+class Broadcaster:
+    """Рассылка подписчикам с учётом лимитов Telegram и продолжением после перезапуска"""
+
+    def __init__(
+        self,
+        bot: Bot,
+        store: BroadcastStore,
+        rate: float = 30,  # глобальный лимит, сообщений в секунду
+        per_chat_rate: float = 1,  # лимит на один чат
+        workers: int = 30,
+        checkpoint_every: int = 100,
+        card_sender: Callable[..., Awaitable[Any]] | None = None,
+        retries: int = 3,  # попыток на сообщение при сетевых ошибках и 5xx
+        retry_delay: float = 1.0,  # пауза перед повтором, дальше удваивается
+    ):
+        self.bot = bot
+        # сообщения рассылки — строки (текст) или словари-карточки, их отправляет card_sender(chat_id, card, **kwargs)
+        self.card_sender = card_sender
+        self.store = store
+        self.workers = workers
+        self.checkpoint_every = checkpoint_every
+        self.per_chat_rate = per_chat_rate
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._global = TokenBucket(rate)
+        # бакеты только для недавно использованных чатов
+        self._chat_buckets: OrderedDict[int, TokenBucket] = OrderedDict()
+        self._lock = asyncio.Lock()  # рассылки выполняются по очереди
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, 1)
+            while len(self._chat_buckets) > 10_000:
+                self._chat_buckets.popitem(last=False)
+        else:
+            self._chat_buckets.move_to_end(chat_id)
+        return bucket
+
+    async def _send_one(self, chat_id: int, message: str | dict, **kwargs):
+        if isinstance(message, str):
+            await self.bot.send_message(chat_id, message, **kwargs)
+        elif self.card_sender is not None:
+            await self.card_sender(chat_id, message, **kwargs)
+        else:
+            await self.bot.send_message(chat_id, message["caption"], **kwargs)
+
+    async def _send(self, chat_id: int, messages: list[str | dict], **kwargs) -> bool | None:
+        """Отправить все сообщения рассылки в один чат.
+
+        True — доставлено, False — чат недоступен насовсем, None — временная ошибка не прошла за retries попыток.
+        """
+        for message in messages:
+            failures = 0
+            while True:
+                await self._chat_bucket(chat_id).acquire()
+                await self._global.acquire()
+                try:
+                    await self._send_one(chat_id, message, **kwargs)
+                    break
+                except TelegramRetryAfter as e:
+                    logging.warning("Flood wait %s с при рассылке", e.retry_after)
+                    self._global.pause(e.retry_after)
+                except TelegramForbiddenError:
+                    await self.store.unsubscribe(chat_id)
+                    logging.info("Чат %s заблокировал бота — удалён из подписчиков", chat_id)
+                    return False
+                except TelegramBadRequest as e:
+                    if not is_chat_error(e):
+                        # не принято само сообщение — оно не пройдёт и у других, остальные отправляем
+                        logging.error("Сообщение не отправлено в %s: %s", chat_id, e)
+                        break
+                    if "chat not found" in str(e).lower():
+                        await self.store.unsubscribe(chat_id)
+                    logging.error("Ошибка отправки в %s: %s", chat_id, e)
+                    return False
+                except Exception as e:
+                    # сеть, 5xx и т.п. — повторяем это же сообщение, уже доставленные не дублируются
+                    failures += 1
+                    if failures >= self.retries:
+                        logging.error("Не удалось отправить в %s за %s попыток: %r", chat_id, failures, e)
+                        return None
+                    logging.warning("Ошибка отправки в %s: %r, попытка %s/%s", chat_id, e, failures, self.retries)
+                    await asyncio.sleep(self.retry_delay * 2 ** (failures - 1))
+        return True
+
+    async def send(self, chat_id: int, messages: list[str | dict], **kwargs) -> bool | None:
+        """Отправить сообщения одному чату вне рассылки (например, ответ на команду) — с теми же лимитами,
+        паузой при flood wait и повторами; результат — как у рассылки для этого чата"""
+        return await self._send(chat_id, messages, **kwargs)
+
+    async def run(self, broadcast_id: str, messages: list[str | dict], **kwargs):
+        async with self._lock:
+            if await self.store.is_done(broadcast_id):
+                return
+            recipients = await self.store.recipients(broadcast_id)
+            logging.info(f"Рассылка {broadcast_id}: {len(recipients)} получателей")
+            queue: asyncio.Queue[int] = asyncio.Queue()
+            for chat_id in recipients:
+                queue.put_nowait(chat_id)
+            delivered: list[int] = []
+            failed: list[int] = []
+
+            async def checkpoint():
+                batch = delivered[:]
+                delivered.clear()
+                if batch:
+                    await self.store.mark_delivered(broadcast_id, batch)
+
+            async def worker():
+                while True:
+                    try:
+                        chat_id = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    try:
+                        sent = await self._send(chat_id, messages, **kwargs)
+                    except Exception as e:
+                        logging.error("Ошибка отправки в %s: %s", chat_id, e)
+                        sent = None
+                    if sent is None:
+                        # не отмечаем — рассылка останется незавершённой и дойдёт при следующем запуске
+                        failed.append(chat_id)
+                        continue
+                    # недоступные насовсем чаты тоже отмечаем, чтобы не повторять им рассылку
+                    delivered.append(chat_id)
+                    if len(delivered) >= self.checkpoint_every:
+                        await checkpoint()
+
+            try:
+                await asyncio.gather(*(worker() for _ in range(self.workers)))
+            finally:
+                # и при отмене (остановка бота): иначе отправленное после последней отметки уйдёт повторно
+                await asyncio.shield(checkpoint())
+            if failed:
+                logging.warning(f"Рассылка {broadcast_id}: не доставлено {len(failed)}, повтор при следующем запуске")
+                return
+            await self.store.finish(broadcast_id)
+            logging.info(f"Рассылка {broadcast_id} завершена")
+
+    async def broadcast(self, messages: list[str | dict], **kwargs) -> str:
+        """Сохранить рассылку и отправить её всем подписчикам"""
+        broadcast_id = await self.store.create(messages)
+        await self.run(broadcast_id, messages, **kwargs)
+        return broadcast_id
+
+    async def resume(self, **kwargs):
+        """Досылать рассылки, прерванные перезапуском"""
+        for broadcast_id, messages in await self.store.pending():
+            await self.run(broadcast_id, messages, **kwargs)
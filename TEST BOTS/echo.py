@@ -1,15 +1,33 @@
+from startup import profiler  # первым — отсчёт времени холодного старта
+
+import logging
+
 from aiogram import Bot, Dispatcher, F
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
 
 # Вместо BOT TOKEN HERE нужно вставить токен вашего бота,
 # полученный у @BotFather
 from config import BOT_TOKEN
+from launcher import run_bot, setting
+from log_setup import setup_logging
+from media_echo import MEDIA_KINDS, DebugDump, MediaEcho
+
+profiler.mark("imports")
+
+setup_logging(level=logging.INFO, json_output=setting("LOG_JSON", False))
 
 # Создаем объекты бота и диспетчера
 bot = Bot(token=BOT_TOKEN)
 dp = Dispatcher()
 
+# Отладочный дамп входящих сообщений: ECHO_DEBUG = True, ECHO_DEBUG_SAMPLE — доля сообщений (0..1)
+debug_dump = DebugDump(enabled=setting("ECHO_DEBUG", False), sample=setting("ECHO_DEBUG_SAMPLE", 0.01))
+dp.message.outer_middleware(debug_dump)
+# ECHO_PHOTO_SIZE: "largest", "smallest" или максимальная сторона в пикселях, например 800
+media_echo = MediaEcho(bot, photo_size=setting("ECHO_PHOTO_SIZE", "largest"),
+                       cache_size=setting("ECHO_FILE_CACHE", 1024))
+
 
 # Этот хэндлер будет срабатывать на команду "/start"
 async def process_start_command(message: Message):
@@ -25,36 +43,25 @@ async def process_help_command(message: Message):
         'Напиши мне что-нибудь и в ответ '
         'я пришлю тебе твое сообщение'
     )
-    print(message.model_dump_json(indent=4, exclude_none=True))
-
-
-# Этот хэндлер будет срабатывать на отправку боту фото
-async def send_photo_echo(message: Message):
-    import pprint
-    pprint.pprint(message)
-    await message.reply_photo(message.photo[0].file_id)
-async def send_audio_echo(message: Message):
-    import pprint
-    pprint.pprint(message)
-    await message.reply_audio(message.audio.file_id)
-async def send_video_echo(message: Message):
-    import pprint
-    pprint.pprint(message)
-    await message.reply_video(message.video.file_id)
-async def send_sticker_echo(message: Message):
-    import pprint
-    pprint.pprint(message)
-    await message.reply_sticker(message.sticker.file_id)
-async def send_gif_echo(message: Message):
-    await message.reply_animation(message.animation.file_id)
-
-async def send_voice_echo(message: Message):
-    await message.reply_voice(message.voice.file_id)
-async def send_document_echo(message: Message):
-    await message.reply_document(message.document.file_id)
-async def send_video_note_echo(message: Message):
-    await message.reply_video_note(message.video_note.file_id)
-    
+
+
+# Этот хэндлер будет срабатывать на отправку боту фото, аудио, видео, стикеров и т.д. —
+# сообщение копируется целиком (copy_message), альбом — одним запросом
+async def send_media_echo(message: Message):
+    await media_echo.handle(message)
+
+
+# Включить/выключить отладочный дамп сообщений: "/debug on", "/debug off"
+async def process_debug_command(message: Message, command: CommandObject):
+    if message.from_user.id not in setting("ECHO_ADMINS", ()):
+        return
+    if command.args in ("on", "off"):
+        debug_dump.enabled = command.args == "on"
+    await message.answer(
+        f"Дамп: {'вкл' if debug_dump.enabled else 'выкл'}, выборка {debug_dump.sample:.0%}, "
+        f"записано {debug_dump.dumped}\n"
+        f"Кэш файлов: {len(media_echo.files)}, попаданий {media_echo.files.hits}, промахов {media_echo.files.misses}"
+    )
 
 
 # Этот хэндлер будет срабатывать на любые ваши текстовые сообщения,
@@ -66,21 +73,13 @@ async def send_echo(message: Message):
 # Регистрируем хэндлеры
 dp.message.register(process_start_command, Command(commands='start'))
 dp.message.register(process_help_command, Command(commands='help'))
-dp.message.register(send_photo_echo, F.photo)
-
-dp.message.register(send_audio_echo, F.audio)
-dp.message.register(send_video_echo, F.video)
-dp.message.register(send_sticker_echo, F.sticker)
-dp.message.register(send_gif_echo, F.animation)
-
-dp.message.register(send_voice_echo, F.voice)
-dp.message.register(send_document_echo, F.document)
-dp.message.register(send_video_note_echo, F.video_note)
+dp.message.register(process_debug_command, Command(commands='debug'))
+dp.message.register(send_media_echo, F.content_type.in_(MEDIA_KINDS))
 
 dp.message.register(send_echo)
 
 if __name__ == '__main__':
-    dp.run_polling(bot)
+    run_bot(dp, bot)  # polling или webhook — см. BOT_MODE в config.py
 
 # async def main():
 #     await dp.start_polling(bot)
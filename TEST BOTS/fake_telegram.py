@@ -0,0 +1,129 @@
+"""Локальный фейковый Bot API для офлайн-проверки ботов.
+
+Запуск:  python fake_telegram.py [порт]
+В config.py:  TELEGRAM_API_URL = "http://127.0.0.1:8081"
+
+Поддерживает getMe, getUpdates, setWebhook/deleteWebhook и любые send*/answer*/edit* методы
+(они просто запоминаются). Апдейты можно подложить через POST /_fake/updates,
+а если установлен webhook — они сразу пересылаются на него с секретом.
+"""
+import asyncio
+import itertools
+import json
+import logging
+import sys
+import time
+
+import aiohttp
+from aiohttp import web
+
+
+class FakeTelegram:
+    def __init__(self):
+        self.updates: asyncio.Queue[dict] = asyncio.Queue()
+        self.sent: list[tuple[str, dict]] = []  # (метод, параметры)
+        self.webhook: tuple[str, str | None] | None = None  # (url, secret)
+        self._update_id = itertools.count(1)
+        self._message_id = itertools.count(1)
+
+    def make_update(self, chat_id: int, text: str) -> dict:
+        return {
+            "update_id": next(self._update_id),
+            "message": {
+                "message_id": next(self._message_id),
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "private"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": f"user{chat_id}"},
+                "text": text,
+            },
+        }
+
+    async def push(self, update: dict):
+        if self.webhook is None:
+            await self.updates.put(update)
+            return
+        url, secret = self.webhook
+        headers = {"X-Telegram-Bot-Api-Secret-Token": secret} if secret else {}
+        async with aiohttp.ClientSession() as session:
+            async with session.post(url, json=update, headers=headers) as resp:
+                if resp.status != 200:
+                    logging.warning(f"Webhook ответил {resp.status}")
+
+    async def _params(self, request: web.Request) -> dict:
+        if request.content_type == "application/json":
+            return await request.json()
+        # загруженные файлы (multipart) — только имя и размер, чтобы /_fake/sent оставался JSON
+        return {
+            key: f"<file {value.filename}, {len(value.file.read())} B>" if isinstance(value, web.FileField) else value
+            for key, value in (await request.post()).items()
+        }
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        params = await self._params(request)
+        result: object = True
+
+        if method == "getMe":
+            result = {"id": 1, "is_bot": True, "first_name": "Fake", "username": "fake_bot"}
+        elif method == "getUpdates":
+            timeout = float(params.get("timeout") or 0)
+            updates = []
+            try:
+                updates.append(await asyncio.wait_for(self.updates.get(), timeout or 0.01))
+                while not self.updates.empty():
+                    updates.append(self.updates.get_nowait())
+            except asyncio.TimeoutError:
+                pass
+            result = updates
+        elif method == "setWebhook":
+            self.webhook = (params["url"], params.get("secret_token"))
+        elif method == "deleteWebhook":
+            self.webhook = None
+        elif method == "getWebhookInfo":
+            result = {"url": self.webhook[0] if self.webhook else "", "has_custom_certificate": False,
+                      "pending_update_count": self.updates.qsize()}
+        else:
+            self.sent.append((method, params))
+            if method in ("copyMessages", "forwardMessages"):
+                ids = params.get("message_ids")
+                ids = json.loads(ids) if isinstance(ids, str) else ids or []
+                result = [{"message_id": next(self._message_id)} for _ in ids]
+            elif method.startswith("send") or method.startswith("copy"):
+                chat_id = int(params.get("chat_id", 0))
+                result = {
+                    "message_id": next(self._message_id),
+                    "date": int(time.time()),
+                    "chat": {"id": chat_id, "type": "private"},
+                    "text": params.get("text", ""),
+                }
+                if method == "sendPhoto":
+                    # загруженный файл получает новый file_id, отправленный по file_id — тот же
+                    photo = params.get("photo")
+                    uploaded = str(photo).startswith("attach://")
+                    file_id = f"fake-photo-{result['message_id']}" if uploaded else photo
+                    result["photo"] = [{"file_id": file_id, "file_unique_id": file_id, "width": 640, "height": 350}]
+                    result.pop("text")
+        return web.json_response({"ok": True, "result": result})
+
+    async def handle_push(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        update = data if "update_id" in data else self.make_update(data["chat_id"], data["text"])
+        await self.push(update)
+        return web.json_response({"ok": True})
+
+    async def handle_sent(self, request: web.Request) -> web.Response:
+        return web.json_response([{"method": m, "params": p} for m, p in self.sent])
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle_method)
+        app.router.add_get("/bot{token}/{method}", self.handle_method)
+        app.router.add_post("/_fake/updates", self.handle_push)
+        app.router.add_get("/_fake/sent", self.handle_sent)
+        return app
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    port = int(sys.argv[1]) if len(sys.argv) > 1 else 8081
+    web.run_app(FakeTelegram().app(), host="127.0.0.1", port=port)
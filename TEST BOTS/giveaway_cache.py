@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, NamedTuple
+
+
+class CachedGiveaways(NamedTuple):
+    games: list[dict]  # уже отфильтрованные раздачи
+    pages: Any  # страницы HTML-ответа для /info (render.PageBook, рендерятся лениво)
+    cards: tuple = ()  # карточки с картинками (giveaway_images.make_card), если включены
+
+
+class GiveawayCache:
+    """Кэш ответа /info с TTL и single-flight: одновременные промахи ждут одну загрузку"""
+
+    def __init__(
+        self,
+        loader: Callable[[], Awaitable[Any]],
+        ttl: float = 300,
+        serve_stale: bool = True,
+    ):
+        self.loader = loader
+        self.ttl = ttl
+        # отдавать устаревшее значение, пока новое грузится в фоне
+        self.serve_stale = serve_stale
+        self._value: Any = None
+        self._expires_at = 0.0
+        self._inflight: asyncio.Task | None = None
+
+    def put(self, value: Any):
+        self._value = value
+        self._expires_at = time.monotonic() + self.ttl
+
+    def invalidate(self):
+        self._expires_at = 0.0
+
+    @property
+    def value(self) -> Any:
+        """Последнее загруженное значение, даже если TTL уже истёк"""
+        return self._value
+
+    @property
+    def fresh(self) -> bool:
+        return self._value is not None and time.monotonic() < self._expires_at
+
+    async def get(self) -> Any:
+        if self.fresh:
+            return self._value
+        if self.serve_stale and self._value is not None:
+            if self._inflight is None:
+                self._inflight = asyncio.create_task(self._load(background=True))
+            return self._value
+        return await self.refresh()
+
+    async def refresh(self) -> Any:
+        """Загрузить значение заново; параллельные вызовы разделяют одну загрузку"""
+        if self._inflight is None:
+            self._inflight = asyncio.create_task(self._load())
+        # shield — отмена одного ожидающего хэндлера не отменяет общую загрузку
+        return await asyncio.shield(self._inflight)
+
+    async def _load(self, background: bool = False) -> Any:
+        try:
+            value = await self.loader()
+            self.put(value)
+            return value
+        except Exception as e:
+            if not background:
+                raise
+            # фоновую загрузку никто не ждёт — ошибку пишем в лог, а отдаём по-прежнему старое значение
+            logging.error(f"Ошибка фонового обновления кэша: {e!r}")
+            return self._value
+        finally:
+            self._inflight = None
@@ -0,0 +1,100 @@
+"""Сравнение снимков раздач: последний снимок хранится по id вместе с хэшем содержимого.
+
+Каждый новый список превращается в короткий поток событий added / changed / expired,
+и подписчики (уведомления, кэш /info, ...) работают только с изменившимися раздачами.
+Если ничего не изменилось, подписчики не вызываются вовсе.
+"""
+import logging
+from typing import Any, Awaitable, Callable, NamedTuple
+
+ADDED = "added"
+CHANGED = "changed"
+EXPIRED = "expired"
+
+# поля, изменение которых считается изменением раздачи
+TRACKED_FIELDS = (
+    "title", "worth", "status", "end_date", "description",
+    "open_giveaway_url", "image", "type", "platforms",
+)
+
+
+class Change(NamedTuple):
+    kind: str  # ADDED / CHANGED / EXPIRED
+    id: Any
+    game: dict  # текущая версия (для пропавшей из API — последняя известная)
+    previous: dict | None
+
+
+Subscriber = Callable[[list[Change]], Awaitable[None]]
+
+
+def is_expired(game: dict) -> bool:
+    return str(game.get("status", "")).lower() == "expired"
+
+
+class SnapshotDiff:
+    def __init__(self, fields: tuple[str, ...] = TRACKED_FIELDS):
+        self.fields = fields
+        self._games: dict[Any, dict] = {}
+        self._hashes: dict[Any, int] = {}
+        self._subscribers: list[Subscriber] = []
+
+    def subscribe(self, callback: Subscriber) -> Subscriber:
+        """Подписать обработчик событий (можно использовать как декоратор)"""
+        self._subscribers.append(callback)
+        return callback
+
+    def games(self) -> list[dict]:
+        """Раздачи последнего снимка"""
+        return list(self._games.values())
+
+    def fingerprint(self, game: dict) -> int:
+        # repr — потому что значения могут быть списками
+        return hash(tuple(repr(game.get(name)) for name in self.fields))
+
+    def diff(self, games: list[dict]) -> list[Change]:
+        """Сравнить список с предыдущим снимком и запомнить его как текущий"""
+        changes = []
+        current: dict[Any, dict] = {}
+        hashes: dict[Any, int] = {}
+        for game in games:
+            game_id = game.get("id")
+            if game_id in current:
+                continue
+            digest = self.fingerprint(game)
+            current[game_id] = game
+            hashes[game_id] = digest
+
+            old_digest = self._hashes.get(game_id)
+            if old_digest is None:
+                changes.append(Change(ADDED, game_id, game, None))
+            elif old_digest != digest:
+                previous = self._games[game_id]
+                kind = EXPIRED if is_expired(game) and not is_expired(previous) else CHANGED
+                changes.append(Change(kind, game_id, game, previous))
+
+        for game_id, game in self._games.items():
+            if game_id not in current:
+                changes.append(Change(EXPIRED, game_id, game, game))
+
+        self._games, self._hashes = current, hashes
+        return changes
+
+    async def update(self, games: list[dict]) -> list[Change]:
+        """Сравнить снимок и раздать события подписчикам"""
+        changes = self.diff(games)
+        if not changes:
+            logging.debug("Раздачи не изменились")
+            return changes
+        logging.info(
+            "Изменения раздач: +%s ~%s -%s",
+            sum(c.kind == ADDED for c in changes),
+            sum(c.kind == CHANGED for c in changes),
+            sum(c.kind == EXPIRED for c in changes),
+        )
+        for subscriber in self._subscribers:
+            try:
+                await subscriber(changes)
+            except Exception as e:
+                logging.error("Ошибка подписчика %s: %r", getattr(subscriber, "__name__", subscriber), e)
+        return changes
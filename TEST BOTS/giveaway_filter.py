@@ -0,0 +1,108 @@
+import json
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+
+
+@dataclass
+class FilterRules:
+    # раздача отсекается, если термин встречается в title или gamerpower_url
+    blacklist: list[str] = field(default_factory=lambda: [
+        "alienware",
+        "dungeonloot",
+        "key",
+        "pack",
+        "dlc",
+        "beta",
+        "early access",
+    ])
+    # термины из whitelist перекрывают blacklist
+    whitelist: list[str] = field(default_factory=list)
+    # допустимые значения поля type (пусто — любые)
+    types: list[str] = field(default_factory=lambda: ["Game"])
+    # хотя бы одна платформа должна встречаться в поле platforms (пусто — любые)
+    platforms: list[str] = field(default_factory=list)
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "FilterRules":
+        defaults = cls()
+        return cls(
+            blacklist=data.get("blacklist", defaults.blacklist),
+            whitelist=data.get("whitelist", defaults.whitelist),
+            types=data.get("types", defaults.types),
+            platforms=data.get("platforms", defaults.platforms),
+        )
+
+
+def _compile(terms: list[str]) -> re.Pattern | None:
+    """Все термины — в одну регулярку-альтернацию (длинные первыми)"""
+    terms = sorted({t.lower() for t in terms if t}, key=len, reverse=True)
+    if not terms:
+        return None
+    return re.compile("|".join(map(re.escape, terms)))
+
+
+class GiveawayFilter:
+    """Фильтр раздач: правила компилируются один раз и перечитываются при изменении файла"""
+
+    def __init__(self, rules: FilterRules | None = None, path: str | None = None, reload_interval: float = 5):
+        self.path = Path(path) if path else None
+        self.reload_interval = reload_interval
+        self._mtime: float | None = None
+        self._checked_at = 0.0
+        self.apply(rules or FilterRules())
+        self.maybe_reload()
+
+    def apply(self, rules: FilterRules):
+        self.rules = rules
+        self._blacklist = _compile(rules.blacklist)
+        self._whitelist = _compile(rules.whitelist)
+        self._types = frozenset(rules.types)
+        self._platforms = _compile(rules.platforms)
+
+    def maybe_reload(self):
+        """Перечитать правила, если файл изменился (проверка не чаще reload_interval)"""
+        if self.path is None:
+            return
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return
+        self._checked_at = now
+
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            return
+        if mtime == self._mtime:
+            return
+
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.apply(FilterRules.from_dict(json.load(f)))
+            self._mtime = mtime
+            logging.info(f"Правила фильтра загружены из {self.path}")
+        except Exception as e:
+            logging.error(f"Ошибка чтения {self.path}: {e}")
+
+    def match(self, game: dict) -> bool:
+        if self._types and game.get("type") not in self._types:
+            return False
+
+        if self._platforms is not None:
+            if not self._platforms.search(game.get("platforms", "").lower()):
+                return False
+
+        text = f'{game.get("title", "")}\n{game.get("gamerpower_url", "")}'.lower()
+        if self._whitelist is not None and self._whitelist.search(text):
+            return True
+        if self._blacklist is not None and self._blacklist.search(text):
+            return False
+        return True
+
+    def filter(self, games: list[dict]) -> list[dict]:
+        self.maybe_reload()
+        match = self.match
+        return [g for g in games if match(g)]
@@ -0,0 +1,148 @@
+"""Карточки раздач с картинкой: каждая картинка скачивается и загружается в Telegram один раз.
+
+После первой отправки file_id из ответа Telegram сохраняется в базе по id раздачи —
+повторные /info и рассылки отправляют только file_id, без байтов картинки.
+Когда раздача заканчивается, запись удаляется (evict). Если Telegram отклоняет сохранённый file_id,
+он забывается и картинка загружается заново; если не принимает саму картинку — карточка уходит текстом.
+"""
+import asyncio
+import logging
+import time
+from typing import Iterable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import BufferedInputFile, Message
+
+from broadcast import is_chat_error
+from http_client import HttpClient
+from sqlite_db import SqliteDB
+
+CAPTION_LIMIT = 1024  # лимит подписи к фото в Telegram
+DOWNLOAD_RETRY_AFTER = 600  # не пытаться снова скачать битую картинку столько секунд
+
+
+class FileIdStore:
+    """SQLite (WAL): id раздачи -> file_id загруженной картинки; чтение — из памяти"""
+
+    def __init__(self, path: str = "giveaway_images.sqlite3"):
+        self.path = path
+        self._ids: dict[str, str] = {}
+        self._db = SqliteDB(
+            path,
+            "CREATE TABLE IF NOT EXISTS images ("
+            " giveaway_id TEXT PRIMARY KEY,"
+            " file_id TEXT NOT NULL,"
+            " uploaded REAL NOT NULL)",
+        )
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def get(self, giveaway_id) -> str | None:
+        return self._ids.get(str(giveaway_id))
+
+    async def load(self):
+        self._ids = dict(await asyncio.to_thread(self._db.fetch, "SELECT giveaway_id, file_id FROM images"))
+
+    async def put(self, giveaway_id, file_id: str):
+        self._ids[str(giveaway_id)] = file_id
+        await asyncio.to_thread(
+            self._db.execute, "INSERT OR REPLACE INTO images (giveaway_id, file_id, uploaded) VALUES (?, ?, ?)",
+            (str(giveaway_id), file_id, time.time()),
+        )
+
+    async def evict(self, ids: Iterable) -> int:
+        keys = [str(i) for i in ids if str(i) in self._ids]
+        for key in keys:
+            del self._ids[key]
+        if not keys:
+            return 0
+        await asyncio.to_thread(self._db.execute, "DELETE FROM images WHERE giveaway_id = ?", [(k,) for k in keys], True)
+        return len(keys)
+
+    async def close(self):
+        await self._db.close()
+
+
+def image_url(game: dict) -> str | None:
+    return game.get("image") or game.get("thumbnail") or None
+
+
+def make_card(game: dict, caption: str) -> dict:
+    """Карточка для рассылки — только JSON-типы, чтобы её можно было сохранить в BroadcastStore"""
+    return {"id": game.get("id"), "image": image_url(game), "caption": caption}
+
+
+class PhotoCards:
+    """Отправка карточек: file_id из кэша, иначе одна загрузка на раздачу, остальные ждут её"""
+
+    def __init__(self, bot: Bot, client: HttpClient, store: FileIdStore, concurrency: int = 4):
+        self.bot = bot
+        self.client = client
+        self.store = store
+        self._downloads = asyncio.Semaphore(concurrency)
+        self._uploads: dict[str, asyncio.Future] = {}
+        self._failed: dict[str, float] = {}  # id -> когда не удалось скачать картинку
+
+    async def _download(self, key: str, url: str | None) -> bytes | None:
+        if not url:
+            return None
+        failed_at = self._failed.get(key)
+        if failed_at is not None and time.monotonic() - failed_at < DOWNLOAD_RETRY_AFTER:
+            return None
+        async with self._downloads:
+            status, data = await self.client.get_bytes(url)
+        if data is None:
+            logging.warning("Не удалось скачать картинку раздачи %s (%s): %s", key, url, status)
+            self._failed[key] = time.monotonic()
+        else:
+            self._failed.pop(key, None)
+        return data
+
+    async def send(self, chat_id: int, card: dict, **kwargs) -> Message:
+        key = str(card["id"])
+        caption = card["caption"]
+        while True:
+            # пока картинку загружает другой получатель — ждём его file_id
+            while (pending := self._uploads.get(key)) is not None:
+                await asyncio.wait({pending})
+            file_id = self.store.get(key)
+            if file_id is None:
+                break
+            try:
+                return await self.bot.send_photo(chat_id, file_id, caption=caption, **kwargs)
+            except TelegramBadRequest as e:
+                if is_chat_error(e):
+                    raise
+                logging.warning("Telegram отклонил file_id картинки раздачи %s: %s — загружаем заново", key, e.message)
+                if self.store.get(key) == file_id:
+                    await self.store.evict([key])
+
+        done = asyncio.get_running_loop().create_future()
+        self._uploads[key] = done
+        try:
+            data = await self._download(key, card.get("image"))
+            if data is not None:
+                try:
+                    message = await self.bot.send_photo(
+                        chat_id, BufferedInputFile(data, filename=f"{key}.jpg"), caption=caption, **kwargs)
+                except TelegramBadRequest as e:
+                    if is_chat_error(e):
+                        raise
+                    logging.warning("Telegram не принял картинку раздачи %s: %s — отправляем текстом", key, e.message)
+                    self._failed[key] = time.monotonic()  # и не скачиваем её снова DOWNLOAD_RETRY_AFTER секунд
+                else:
+                    # самый большой размер — его file_id Telegram отдаёт тем же фото
+                    await self.store.put(key, message.photo[-1].file_id)
+                    return message
+            return await self.bot.send_message(chat_id, caption, **kwargs)
+        finally:
+            del self._uploads[key]
+            done.set_result(None)
+
+    async def evict(self, ids: Iterable) -> int:
+        ids = list(ids)
+        for giveaway_id in ids:
+            self._failed.pop(str(giveaway_id), None)
+        return await self.store.evict(ids)
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from http_client import HttpClient
+
+
+GAMERPOWER_API = "https://www.gamerpower.com/api/giveaways"
+
+
+@dataclass
+class Source:
+    """Один источник раздач GamerPower (платформа / endpoint) со своим расписанием"""
+    name: str
+    url: str
+    interval: float = 3600  # обычный период опроса, сек
+    jitter: float = 0.1  # случайный разброс периода, доля от interval
+    retry_delay: float = 60  # первая пауза после ошибки, дальше удваивается до interval
+    failures: int = 0
+    games: list[dict] = field(default_factory=list)
+
+    @classmethod
+    def platform(cls, platform: str, **kwargs) -> "Source":
+        return cls(name=platform, url=f"{GAMERPOWER_API}?platform={platform}", **kwargs)
+
+    def next_delay(self) -> float:
+        if self.failures:
+            delay = min(self.retry_delay * 2 ** (self.failures - 1), self.interval)
+        else:
+            delay = self.interval
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class GiveawayPoller:
+    """Опрашивает несколько источников параллельно и объединяет раздачи по id"""
+
+    def __init__(
+        self,
+        client: HttpClient,
+        sources: list[Source],
+        on_update: Callable[[list[dict]], Awaitable[None]] | None = None,
+        concurrency: int = 4,
+    ):
+        self.client = client
+        self.sources = sources
+        self.on_update = on_update
+        # необязательный хук (source, status, seconds) — например, Metrics.observe_upstream
+        self.on_poll: Callable[[str, int, float], None] | None = None
+        self._semaphore = asyncio.Semaphore(concurrency)
+
+    def merged(self) -> list[dict]:
+        """Раздачи всех источников без дублей (по id, в порядке источников)"""
+        games: dict = {}
+        for source in self.sources:
+            for game in source.games:
+                games.setdefault(game.get("id"), game)
+        return list(games.values())
+
+    async def poll(self, source: Source) -> bool:
+        """Опросить один источник. True — если данные изменились"""
+        async with self._semaphore:
+            started = time.perf_counter()
+            status, data = await self.client.get_json(source.url)
+            if self.on_poll is not None:
+                self.on_poll(source.name, status, time.perf_counter() - started)
+
+        if status == 304:
+            source.failures = 0
+            return False
+        if status == 201:
+            # GamerPower отвечает 201, когда раздач по платформе нет
+            data = []
+        if status not in (200, 201) or not isinstance(data, list):
+            source.failures += 1
+            logging.error(f"Ошибка при запросе к API ({source.name}): {status}")
+            return False
+
+        source.failures = 0
+        source.games = data
+        return True
+
+    async def fetch_all(self) -> list[dict]:
+        """Опросить все источники сразу (например, для холодного /info).
+
+        Изменившиеся данные тоже уходят в on_update: ETag уже обновлён, и плановый опрос
+        этого источника получит 304 — без этого новые раздачи остались бы без уведомления.
+        """
+        changed = await asyncio.gather(*(self.poll(s) for s in self.sources))
+        games = self.merged()
+        if any(changed) and self.on_update is not None:
+            await self.on_update(games)
+        return games
+
+    async def _run_source(self, source: Source):
+        while True:
+            try:
+                if await self.poll(source) and self.on_update is not None:
+                    await self.on_update(self.merged())
+            except Exception as e:
+                source.failures += 1
+                logging.error(f"Ошибка опроса {source.name}: {e!r}")
+            await asyncio.sleep(source.next_delay())
+
+    async def run(self):
+        """Бесконечный опрос: у каждого источника свой цикл, медленный не тормозит остальные"""
+        await asyncio.gather(*(self._run_source(s) for s in self.sources))
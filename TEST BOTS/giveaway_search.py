@@ -0,0 +1,120 @@
+"""Поиск раздач для inline-режима (@bot запрос): инвертированный индекс в памяти.
+
+Слова названия, платформ и описания -> id раздач; отсортированный список слов позволяет
+искать по префиксу через bisect. Индекс обновляется по событиям SnapshotDiff (только изменившиеся
+раздачи), результаты для Telegram (InlineQueryResultArticle) строятся один раз при индексации.
+"""
+import bisect
+import re
+from collections import OrderedDict
+from typing import Any, Callable, Iterable
+
+from aiogram.types import InlineQueryResultArticle
+
+from giveaway_diff import ADDED, CHANGED, EXPIRED, Change
+
+INDEXED_FIELDS = ("title", "platforms", "description")
+RESULTS_LIMIT = 50  # больше Telegram за один ответ не принимает
+
+_WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return _WORD.findall(text.lower())
+
+
+class SearchIndex:
+    def __init__(
+        self,
+        build: Callable[[dict], InlineQueryResultArticle],
+        fields: tuple[str, ...] = INDEXED_FIELDS,
+        cache_size: int = 1024,
+    ):
+        self.build = build  # раздача -> готовый результат inline-запроса
+        self.fields = fields
+        self.cache_size = cache_size
+        self._results: dict[Any, InlineQueryResultArticle] = {}  # id -> результат, в порядке добавления
+        self._words: dict[Any, set[str]] = {}  # id -> слова раздачи (чтобы убрать её из индекса)
+        self._postings: dict[str, set] = {}  # слово -> id раздач
+        self._terms: list[str] = []  # все слова, отсортированы — для поиска по префиксу
+        self._cache: OrderedDict[str, list] = OrderedDict()  # нормализованный запрос -> id
+
+    def __len__(self) -> int:
+        return len(self._results)
+
+    def _remove(self, game_id):
+        for word in self._words.pop(game_id, ()):
+            ids = self._postings[word]
+            ids.discard(game_id)
+            if not ids:
+                del self._postings[word]
+                del self._terms[bisect.bisect_left(self._terms, word)]
+        self._results.pop(game_id, None)
+
+    def add(self, game: dict):
+        game_id = game.get("id")
+        self._remove(game_id)
+        words = set()
+        for name in self.fields:
+            words.update(tokenize(str(game.get(name) or "")))
+        for word in words:
+            ids = self._postings.get(word)
+            if ids is None:
+                ids = self._postings[word] = set()
+                bisect.insort(self._terms, word)
+            ids.add(game_id)
+        self._words[game_id] = words
+        self._results[game_id] = self.build(game)
+        self._cache.clear()
+
+    def remove(self, game_id):
+        if game_id in self._results:
+            self._remove(game_id)
+            self._cache.clear()
+
+    def apply(self, changes: Iterable[Change], accept: Callable[[dict], bool] = lambda game: True):
+        """Обновить индекс по событиям SnapshotDiff; accept — фильтр раздач (например, GiveawayFilter.match)"""
+        for change in changes:
+            if change.kind in (ADDED, CHANGED) and accept(change.game):
+                self.add(change.game)
+            elif change.kind in (CHANGED, EXPIRED):
+                self.remove(change.id)
+
+    def _prefix(self, prefix: str) -> set:
+        """id раздач, в которых есть слово, начинающееся с prefix"""
+        found: set = set()
+        start = bisect.bisect_left(self._terms, prefix)
+        for term in self._terms[start:]:
+            if not term.startswith(prefix):
+                break
+            found |= self._postings[term]
+        return found
+
+    def _match(self, query: str) -> list:
+        words = tokenize(query)
+        key = " ".join(words)
+        ids = self._cache.get(key)
+        if ids is not None:
+            self._cache.move_to_end(key)
+            return ids
+        if not words:
+            ids = list(self._results)
+        else:
+            # все слова запроса должны найтись (последнее обычно недопечатано — поэтому префикс)
+            matched = self._prefix(words[0])
+            for word in words[1:]:
+                if not matched:
+                    break
+                matched &= self._prefix(word)
+            ids = [game_id for game_id in self._results if game_id in matched]
+        self._cache[key] = ids
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return ids
+
+    def search(self, query: str, offset: int = 0, limit: int = RESULTS_LIMIT) -> tuple[list[InlineQueryResultArticle], int | None]:
+        """Результаты для ответа на inline-запрос и offset следующей страницы (None — больше нет)"""
+        ids = self._match(query)
+        page = [self._results[game_id] for game_id in ids[offset:offset + limit]]
+        next_offset = offset + limit if offset + limit < len(ids) else None
+        return page, next_offset
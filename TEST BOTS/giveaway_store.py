@@ -0,0 +1,104 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import Callable, Iterable, Protocol
+
+from sqlite_db import SqliteDB
+
+
+class SeenStore(Protocol):
+    """Хранилище id уже известных раздач"""
+
+    async def load(self) -> set: ...
+
+    async def add_many(self, ids: Iterable) -> None: ...
+
+    async def prune(self) -> int: ...
+
+    async def close(self) -> None: ...
+
+
+class SqliteSeenStore:
+    """SQLite (WAL) хранилище: дописывает только новые id, старые удаляются по сроку.
+
+    Срок считается от последнего появления id в API: add_many для уже известного id продлевает его.
+
+    Все обращения к базе идут в отдельном потоке, event loop не блокируется.
+    """
+
+    def __init__(self, path: str = "known_giveaways.sqlite3", ttl: float = 180 * 24 * 3600,
+                 legacy_json: str | None = "known_giveaways.json"):
+        self.path = path
+        self.ttl = ttl  # через сколько секунд после последнего появления в API id можно забыть
+        self.legacy_json = legacy_json
+        self._db = SqliteDB(
+            path,
+            "CREATE TABLE IF NOT EXISTS seen ("
+            " id TEXT PRIMARY KEY,"
+            " first_seen REAL NOT NULL,"
+            " expires_at REAL NOT NULL)",
+            on_open=self._migrate_json,
+        )
+
+    def _migrate_json(self, conn: sqlite3.Connection):
+        """Однократный перенос старого known_giveaways.json в базу"""
+        if not self.legacy_json or not Path(self.legacy_json).exists():
+            return
+        try:
+            with open(self.legacy_json, "r", encoding="utf-8") as f:
+                ids = json.load(f)
+        except Exception as e:
+            logging.error(f"Ошибка чтения {self.legacy_json}: {e}")
+            return
+        self._insert(conn, ids)
+        Path(self.legacy_json).rename(self.legacy_json + ".migrated")
+        logging.info(f"Перенесено {len(ids)} раздач из {self.legacy_json}")
+
+    def _insert(self, conn: sqlite3.Connection, ids: Iterable):
+        now = time.time()
+        with conn:
+            conn.executemany(
+                "INSERT INTO seen (id, first_seen, expires_at) VALUES (?, ?, ?)"
+                " ON CONFLICT (id) DO UPDATE SET expires_at = excluded.expires_at",
+                [(str(i), now, now + self.ttl) for i in ids],
+            )
+
+    def _load(self) -> set:
+        rows = self._db.fetch("SELECT id FROM seen")
+        # GamerPower отдаёт id числами
+        return {int(r[0]) if r[0].isdigit() else r[0] for r in rows}
+
+    async def load(self) -> set:
+        return await asyncio.to_thread(self._load)
+
+    async def add_many(self, ids: Iterable) -> None:
+        ids = list(ids)
+        await asyncio.to_thread(self._db.run, lambda conn: self._insert(conn, ids))
+
+    async def prune(self) -> int:
+        return await asyncio.to_thread(self._db.execute, "DELETE FROM seen WHERE expires_at < ?", (time.time(),))
+
+    async def close(self) -> None:
+        await self._db.close()
+
+
+async def keep_fresh(store: SeenStore, live: Callable[[], Iterable], interval: float):
+    """Фоновая задача: раз в interval секунд продлевает срок id, которые ещё идут, и удаляет устаревшие.
+
+    Первый проход — через interval, когда опрос уже получил текущий список: иначе после долгого
+    простоя бота удалились бы и id раздач, которые всё ещё идут.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            ids = list(live())
+            if ids:
+                await store.add_many(ids)
+            removed = await store.prune()
+            if removed:
+                logging.info(f"Удалено {removed} устаревших раздач")
+        except Exception as e:
+            logging.error(f"Ошибка обслуживания базы раздач: {e!r}")
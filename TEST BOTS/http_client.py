@@ -0,0 +1,103 @@
+import asyncio
+import logging
+from typing import Any
+
+import aiohttp
+
+
+class HttpClient:
+    """Общий HTTP-клиент с пулом соединений и условными GET-запросами (ETag / Last-Modified).
+
+    Создаётся один раз при старте бота (start) и закрывается при остановке (close).
+    """
+
+    def __init__(
+        self,
+        timeout: float = 10,
+        retries: int = 3,
+        backoff: float = 1.0,
+        limit: int = 20,
+    ):
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.limit = limit
+        self._session: aiohttp.ClientSession | None = None
+        # url -> (etag, last_modified, уже разобранный JSON)
+        self._validators: dict[str, tuple[str | None, str | None, Any]] = {}
+
+    async def start(self):
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.limit, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    async def get_json(self, url: str) -> tuple[int, Any]:
+        """GET с повторами. Возвращает (status, data).
+
+        На 304 тело не скачивается и не парсится — возвращается JSON из прошлого ответа.
+        """
+        await self.start()
+        headers = {}
+        etag, last_modified, cached = self._validators.get(url, (None, None, None))
+        if etag:
+            headers["If-None-Match"] = etag
+        if last_modified:
+            headers["If-Modified-Since"] = last_modified
+
+        for attempt in range(1, self.retries + 1):
+            try:
+                async with self._session.get(url, headers=headers) as resp:
+                    if resp.status == 304:
+                        return 304, cached
+                    if resp.status >= 500 and attempt < self.retries:
+                        logging.warning(f"API вернул {resp.status}, попытка {attempt}/{self.retries}")
+                        await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+                        continue
+                    if resp.status != 200:
+                        return resp.status, None
+
+                    data = await resp.json()
+                    self._validators[url] = (
+                        resp.headers.get("ETag"),
+                        resp.headers.get("Last-Modified"),
+                        data,
+                    )
+                    return 200, data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    logging.error(f"Ошибка запроса {url}: {e!r}")
+                    return 0, None
+                logging.warning(f"Ошибка запроса {url}: {e!r}, попытка {attempt}/{self.retries}")
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+        return 0, None
+
+    async def get_bytes(self, url: str, max_size: int = 10 * 1024 * 1024) -> tuple[int, bytes | None]:
+        """GET двоичного тела (картинки) с повторами. Возвращает (status, data); больше max_size — не качаем"""
+        await self.start()
+        for attempt in range(1, self.retries + 1):
+            try:
+                async with self._session.get(url) as resp:
+                    if resp.status >= 500 and attempt < self.retries:
+                        await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+                        continue
+                    if resp.status != 200:
+                        return resp.status, None
+                    if (resp.content_length or 0) > max_size:
+                        logging.warning(f"Слишком большой файл {url}: {resp.content_length} байт")
+                        return resp.status, None
+                    data = await resp.content.read(max_size + 1)
+                    if len(data) > max_size:
+                        logging.warning(f"Слишком большой файл {url}")
+                        return resp.status, None
+                    return 200, data
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.retries:
+                    logging.error(f"Ошибка загрузки {url}: {e!r}")
+                    return 0, None
+                await asyncio.sleep(self.backoff * 2 ** (attempt - 1))
+        return 0, None
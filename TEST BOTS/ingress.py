@@ -0,0 +1,194 @@
+"""Входной шлюз апдейтов: ограниченная очередь перед хэндлерами, склейка дублей, лимиты и сброс нагрузки.
+
+Регистрируется первым outer middleware на dp.update (до ChatSequencer и т.п.), поэтому
+отброшенный апдейт не занимает ни замок чата, ни хэндлер, ни запрос к Bot API.
+
+- глубина — сколько принятых апдейтов сейчас ждут или обрабатываются; больше max_queue —
+  принимаются только приоритетные (ходы в игре и т.п.), больше hard_limit — только от админов;
+- одинаковый апдейт из того же чата (тот же текст / callback data), пока первый ещё
+  обрабатывается или в течение coalesce_window секунд после него, отбрасывается;
+- у каждого пользователя token bucket: rate апдейтов в секунду, всплеск до burst;
+- inline-запросы (типы latest_only) приходят на каждое нажатие клавиши: лимит на них не действует,
+  а у пользователя выполняется не больше одного сразу — из ждущих только самый свежий, остальные склеиваются.
+Приоритетные апдейты не склеиваются и не отбрасываются при переполнении; админов шлюз не ограничивает.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Iterable
+
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.types import Update
+
+DROP_REASONS = ("coalesced", "rate_limited", "shed")
+
+
+def update_text(update: Update) -> str | None:
+    """Текст сообщения или data callback-кнопки — по нему апдейты склеиваются и определяется приоритет"""
+    if update.message is not None:
+        return update.message.text
+    if update.callback_query is not None:
+        return update.callback_query.data
+    if update.inline_query is not None:
+        return update.inline_query.query
+    return None
+
+
+class IngressGate(BaseMiddleware):
+    def __init__(
+        self,
+        max_queue: int = 1000,
+        hard_limit: int | None = None,  # по умолчанию 2 * max_queue
+        rate: float = 2,
+        burst: float = 5,
+        coalesce_window: float = 2,
+        is_priority: Callable[[Update], bool] | None = None,
+        admins: Iterable[int] = (),
+        max_users: int = 100_000,  # сколько пользователей помнить для лимитов
+        latest_only: Iterable[str] = ("inline_query",),  # типы апдейтов без лимита: от пользователя — последний
+    ):
+        self.max_queue = max_queue
+        self.hard_limit = hard_limit or 2 * max_queue
+        self.rate = rate
+        self.burst = burst
+        self.coalesce_window = coalesce_window
+        self.is_priority = is_priority or (lambda update: False)
+        self.admins = set(admins)
+        self.max_users = max_users
+        self.latest_only = set(latest_only)
+        self.depth = 0
+        self.max_depth = 0
+        self.dropped = dict.fromkeys(DROP_REASONS, 0)
+        self.on_drop: Callable[[str], None] | None = None  # например, счётчик из metrics.py
+        self._buckets: OrderedDict[int, list] = OrderedDict()  # user_id -> [токены, время]
+        self._in_flight: dict[tuple, int] = {}  # (чат, текст) -> сколько обрабатывается
+        self._recent: OrderedDict[tuple, float] = OrderedDict()  # (чат, текст) -> когда закончили
+        self._latest: dict[int, list] = {}  # user_id -> [номер последнего, сколько ждут, замок]
+        self._shedding = False
+
+    def _allow(self, user_id: int) -> bool:
+        now = time.monotonic()
+        bucket = self._buckets.get(user_id)
+        if bucket is None:
+            bucket = self._buckets[user_id] = [self.burst, now]
+            if len(self._buckets) > self.max_users:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(user_id)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        if bucket[0] < 1:
+            return False
+        bucket[0] -= 1
+        return True
+
+    def _is_duplicate(self, key: tuple) -> bool:
+        if key in self._in_flight:
+            return True
+        finished = self._recent.get(key)
+        if finished is None:
+            return False
+        if time.monotonic() - finished < self.coalesce_window:
+            return True
+        del self._recent[key]
+        return False
+
+    def _forget_old(self):
+        now = time.monotonic()
+        while self._recent:
+            key, finished = next(iter(self._recent.items()))
+            if now - finished < self.coalesce_window:
+                break
+            del self._recent[key]
+
+    def _drop(self, reason: str) -> None:
+        self.dropped[reason] += 1
+        if self.on_drop is not None:
+            self.on_drop(reason)
+        return None
+
+    async def __call__(self, handler: Callable[..., Awaitable[Any]], event: Update, data: dict) -> Any:
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        user_id = user.id if user is not None else None
+        if user_id in self.admins:
+            return await self._run(handler, event, data, None)
+
+        priority = self.is_priority(event)
+        if self.depth >= self.hard_limit or (self.depth >= self.max_queue and not priority):
+            if not self._shedding:
+                self._shedding = True
+                logging.warning("Очередь апдейтов переполнена (%s) — отбрасываем неприоритетные", self.depth)
+            return self._drop("shed")
+        if self._shedding and self.depth < self.max_queue // 2:
+            self._shedding = False
+            logging.info("Очередь апдейтов разгружена (%s), отброшено: %s", self.depth, self.dropped)
+
+        if user_id is not None and event.event_type in self.latest_only:
+            return await self._run_latest(handler, event, data, user_id)
+        if user_id is not None and not self._allow(user_id):
+            return self._drop("rate_limited")
+
+        key = None
+        text = update_text(event)
+        if not priority and text is not None:
+            key = (chat.id if chat is not None else user_id, event.event_type, text.strip().lower())
+            if self._is_duplicate(key):
+                return self._drop("coalesced")
+        return await self._run(handler, event, data, key)
+
+    async def _run(self, handler, event: Update, data: dict, key: tuple | None) -> Any:
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+        if key is not None:
+            self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        try:
+            return await handler(event, data)
+        finally:
+            self.depth -= 1
+            if key is not None:
+                left = self._in_flight.pop(key) - 1
+                if left:
+                    self._in_flight[key] = left
+                self._recent[key] = time.monotonic()
+                self._recent.move_to_end(key)
+                self._forget_old()
+
+    async def _run_latest(self, handler, event: Update, data: dict, user_id: int) -> Any:
+        """Пока запрос пользователя обрабатывается, новые ждут; дождавшись, выполняется только самый свежий"""
+        state = self._latest.get(user_id)
+        if state is None:
+            state = self._latest[user_id] = [0, 0, asyncio.Lock()]
+        state[0] += 1
+        state[1] += 1
+        number = state[0]
+        try:
+            async with state[2]:
+                if number != state[0]:
+                    return self._drop("coalesced")
+                return await self._run(handler, event, data, None)
+        finally:
+            state[1] -= 1
+            if not state[1]:
+                del self._latest[user_id]
+
+    def stats(self) -> dict:
+        return {"depth": self.depth, "max_depth": self.max_depth, **self.dropped}
+
+
+def setup_ingress(dp: Dispatcher, **kwargs) -> IngressGate:
+    """Поставить шлюз первым outer middleware на dp.update; вызывать до остальных outer middleware"""
+    gate = IngressGate(**kwargs)
+    dp.update.outer_middleware(gate)
+    dp["ingress"] = gate
+
+    async def on_startup(metrics=None):
+        if metrics is None:
+            return
+        metrics.add_gauge("bot_ingress_depth", "Апдейтов в обработке и ожидании", lambda: gate.depth)
+        dropped = metrics.add_counter("bot_ingress_dropped_total", "Отброшенные апдейты", ("reason",))
+        gate.on_drop = dropped.inc
+
+    dp.startup.register(on_startup)
+    return gate
@@ -0,0 +1,176 @@
+"""Общий запуск ботов: long polling или webhook, в зависимости от настроек в config.py.
+
+Необязательные настройки (если их нет в config.py, берутся значения по умолчанию):
+
+BOT_MODE = "polling"            # или "webhook", или "sharded" (см. shard_runtime.py)
+WEBHOOK_URL = "https://example.com"   # публичный адрес, куда Telegram шлёт апдейты
+WEBHOOK_PATH = "/webhook"
+WEBHOOK_SECRET = "..."          # проверяется в заголовке X-Telegram-Bot-Api-Secret-Token
+WEBHOOK_HOST = "0.0.0.0"
+WEBHOOK_PORT = 8080
+WEBHOOK_WORKERS = 1             # >1 — несколько процессов на одном порту (SO_REUSEPORT, только Linux)
+TELEGRAM_API_URL = None         # например, "http://127.0.0.1:8081" для fake_telegram.py
+METRICS_ENABLED = False         # метрики Prometheus (см. metrics.py)
+METRICS_PORT = 9100             # при нескольких процессах (webhook, sharded) у процесса i — METRICS_PORT + i
+LOG_JSON = False                # логи в файл строками JSON (см. log_setup.py)
+SHARDS = 4                      # для BOT_MODE = "sharded": число процессов-воркеров
+SHARD_INGRESS = "polling"       # как супервизор получает апдейты: "polling" или "webhook"
+STARTUP_DEFERRED = True         # загрузка состояния в фоне, не задерживая приём апдейтов (см. startup.py)
+STARTUP_REPORT = None           # файл, куда дописывается замер холодного старта
+LOOP_MONITOR = False            # лаг event loop, блокирующие вызовы со стеком, медленные хэндлеры (см. loop_monitor.py)
+LOOP_BLOCK_THRESHOLD = 0.1      # сколько секунд занятого цикла считать блокировкой
+UVLOOP = False                  # использовать uvloop, если он установлен
+ADMINS = ()                     # id админов — шлюз апдейтов их не ограничивает (см. ingress.py)
+"""
+import logging
+import multiprocessing
+import secrets
+import signal
+import sys
+from typing import TYPE_CHECKING
+
+from aiogram import Bot, Dispatcher
+from aiogram.client.telegram import TelegramAPIServer
+
+import config
+from startup import profiler
+
+if TYPE_CHECKING:
+    from aiohttp import web
+
+
+def setting(name: str, default=None):
+    return getattr(config, name, default)
+
+
+def use_api_server(bot: Bot, url: str | None = None):
+    """Направить запросы бота на другой Bot API сервер (локальный или тестовый)"""
+    url = url or setting("TELEGRAM_API_URL")
+    if url:
+        bot.session.api = TelegramAPIServer.from_base(url)
+
+
+def build_webhook_app(dp: Dispatcher, bot: Bot, path: str, secret: str | None) -> "web.Application":
+    # нужны только в режиме webhook — не тратим на них время при запуске в polling
+    from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+    from aiohttp import web
+
+    app = web.Application()
+    # SimpleRequestHandler сам отвечает 401, если секрет в заголовке не совпал
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret).register(app, path=path)
+    # startup/shutdown диспетчера и закрытие сессии бота вместе с приложением
+    setup_application(app, dp, bot=bot)
+    return app
+
+
+def _serve_webhook(dp: Dispatcher, bot: Bot, worker: int, reuse_port: bool):
+    path = setting("WEBHOOK_PATH", "/webhook")
+    secret = setting("WEBHOOK_SECRET") or None
+    url = setting("WEBHOOK_URL")
+
+    if worker == 0 and url:
+        async def set_webhook():
+            await bot.set_webhook(f"{url.rstrip('/')}{path}", secret_token=secret)
+            logging.info(f"Webhook установлен: {url}{path}")
+        dp.startup.register(set_webhook)
+
+    # хэндлеры startup могут принять is_primary и запускать фоновые задачи только один раз
+    dp["is_primary"] = worker == 0
+    dp["worker_index"] = worker
+    app = build_webhook_app(dp, bot, path, secret)
+    from aiohttp import web
+    web.run_app(
+        app,
+        host=setting("WEBHOOK_HOST", "0.0.0.0"),
+        port=setting("WEBHOOK_PORT", 8080),
+        reuse_port=reuse_port or None,
+        shutdown_timeout=10,  # дать хэндлерам закончить при остановке
+        print=None,
+    )
+
+
+def run_webhook(dp: Dispatcher, bot: Bot):
+    workers = setting("WEBHOOK_WORKERS", 1)
+    if setting("WEBHOOK_SECRET") is None:
+        logging.warning("WEBHOOK_SECRET не задан — запросы к webhook не проверяются")
+    if workers <= 1:
+        _serve_webhook(dp, bot, 0, reuse_port=False)
+        return
+
+    # fork: каждый процесс получает свою копию бота и слушает тот же порт
+    ctx = multiprocessing.get_context("fork")
+    processes = [
+        ctx.Process(target=_serve_webhook, args=(dp, bot, i, True), name=f"webhook-{i}")
+        for i in range(workers)
+    ]
+    for p in processes:
+        p.start()
+
+    def stop(*_):
+        # SIGTERM дочерним процессам: aiohttp корректно дорабатывает текущие запросы
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for p in processes:
+            p.join()
+    except KeyboardInterrupt:
+        stop()
+        for p in processes:
+            p.join()
+
+
+async def _delete_webhook(bot: Bot):
+    await bot.delete_webhook()
+
+
+def use_event_loop_policy():
+    """uvloop вместо стандартного цикла, если UVLOOP включён; вызывать до создания event loop"""
+    if setting("UVLOOP", False):
+        from loop_monitor import use_uvloop
+        use_uvloop()
+
+
+def setup_instrumentation(dp: Dispatcher, bot: Bot):
+    """Метрики, монитор event loop и замер старта — в каждом процессе, который обрабатывает апдейты"""
+    if setting("METRICS_ENABLED", False):
+        from metrics import setup_metrics
+        setup_metrics(dp, bot, port=setting("METRICS_PORT", 9100))
+    if setting("LOOP_MONITOR", False):
+        from loop_monitor import setup_loop_monitor
+        setup_loop_monitor(dp, threshold=setting("LOOP_BLOCK_THRESHOLD", 0.1))
+    profiler.install(dp, bot)
+
+
+def run_bot(dp: Dispatcher, bot: Bot, **kwargs):
+    """Запустить бота в режиме BOT_MODE; kwargs передаются в start_polling"""
+    use_api_server(bot)
+    use_event_loop_policy()
+    mode = setting("BOT_MODE", "polling")
+    if mode == "sharded":
+        # апдейты обрабатывают шарды — метрики и монитор подключаются в каждом из них (shard_runtime.py),
+        # супервизору нужен только замер времени до первого getUpdates
+        profiler.install(dp, bot)
+    else:
+        setup_instrumentation(dp, bot)
+    logging.info(f"Режим запуска: {mode}")
+    if mode == "webhook":
+        run_webhook(dp, bot)
+    elif mode == "sharded":
+        from shard_runtime import Supervisor
+        # воркеры заново загружают файл запущенного бота и берут из него dp и bot
+        Supervisor(sys.modules["__main__"].__file__, bot, shards=setting("SHARDS", 4),
+                   ingress=setting("SHARD_INGRESS", "polling")).run()
+    elif mode == "polling":
+        # getUpdates не работает, пока установлен webhook (например, после запуска в режиме webhook)
+        dp.startup.register(_delete_webhook)
+        dp.run_polling(bot, **kwargs)
+    else:
+        raise ValueError(f"Неизвестный BOT_MODE: {mode!r}")
+
+
+def new_secret() -> str:
+    """Случайный секрет для WEBHOOK_SECRET"""
+    return secrets.token_urlsafe(32)
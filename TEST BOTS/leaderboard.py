@@ -0,0 +1,247 @@
+"""Таблицы лидеров угадайки в SQLite: по победам, по проценту побед, за день и за неделю.
+
+Порядок хранят индексы базы, они обновляются инкрементально при каждой записи: топ — ORDER BY ... LIMIT
+по индексу, место игрока — COUNT по диапазону того же индекса, но не дальше rank_limit строк (ниже — «за
+пределами первых rank_limit»). Число игроков в каждой таблице — счётчик, его ведут триггеры при записи,
+поэтому /top не пересчитывает таблицу целиком. В памяти — только ещё не записанные
+партии (пишутся пачкой раз в flush_interval секунд), поэтому память не растёт с числом игроков,
+старт не читает таблицу целиком, а все процессы (webhook-воркеры, шарды) видят одни и те же таблицы.
+"""
+import asyncio
+import logging
+import sqlite3
+import time
+from typing import Any, NamedTuple
+
+from sqlite_db import SqliteDB
+
+BOARDS = ("wins", "rate", "day", "week")
+PERIODS = ("day", "week")
+
+
+SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS leaderboard ("
+    " user_id INTEGER PRIMARY KEY,"
+    " name TEXT,"
+    " wins INTEGER NOT NULL,"
+    " games INTEGER NOT NULL,"
+    " rate REAL);"  # wins / games; NULL, пока игр меньше min_games
+    "CREATE INDEX IF NOT EXISTS leaderboard_wins ON leaderboard (wins, games, user_id);"
+    "CREATE INDEX IF NOT EXISTS leaderboard_rate ON leaderboard (rate, games, user_id) WHERE rate IS NOT NULL;"
+    "CREATE TABLE IF NOT EXISTS leaderboard_periods ("
+    " period TEXT NOT NULL,"
+    " user_id INTEGER NOT NULL,"
+    " wins INTEGER NOT NULL,"
+    " games INTEGER NOT NULL,"
+    " PRIMARY KEY (period, user_id));"
+    "CREATE INDEX IF NOT EXISTS leaderboard_periods_top ON leaderboard_periods (period, wins, games, user_id);"
+)
+
+
+class Row(NamedTuple):
+    user_id: int
+    name: str | None
+    wins: int
+    games: int
+
+
+def period_id(period: str, t: float | None = None) -> str:
+    """Ключ текущего дня или недели (UTC), например "day:2026-291" или "week:2026-42" """
+    tm = time.gmtime(t)
+    if period == "day":
+        return f"day:{tm.tm_year}-{tm.tm_yday:03d}"
+    return time.strftime("week:%G-%V", tm)
+
+
+class Leaderboard:
+    """Таблицы лидеров, обновляются после каждой партии; по умолчанию — в той же базе, что и игроки"""
+
+    def __init__(self, path: str = "users.sqlite3", min_games: int = 5, flush_interval: float = 5,
+                 rank_limit: int = 1000):
+        self.path = path
+        self.min_games = min_games  # минимум игр для рейтинга по проценту побед
+        self.rank_limit = rank_limit  # дальше этого места точное место не считаем
+        self.flush_interval = flush_interval
+        self._totals: dict[int, tuple[str | None, int, int]] = {}  # user_id -> (имя, победы, игры)
+        self._periods: dict[tuple[str, int], list[int]] = {}  # (период, user_id) -> [+победы, +игры]
+        self._current: tuple[str, ...] | None = None  # периоды, записи прошлых уже удалены
+        self._db = SqliteDB(path, SCHEMA, on_open=self._open)
+        self._flushing = asyncio.Lock()
+        self._flush_task: asyncio.Task | None = None
+
+    def _open(self, conn: sqlite3.Connection):
+        self._create_counts(conn)
+        self._backfill(conn)
+
+    @staticmethod
+    def _create_counts(conn: sqlite3.Connection):
+        """Счётчики игроков по таблицам ("wins", "rate", ключ периода); их обновляют триггеры в той же транзакции"""
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")  # другой процесс не заполнит счётчики одновременно с нами
+            exists = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'leaderboard_counts'"
+            ).fetchone()
+            if exists:
+                return
+            conn.execute("CREATE TABLE leaderboard_counts (board TEXT PRIMARY KEY, players INTEGER NOT NULL)")
+            # однократно — для таблиц, заполненных до появления счётчиков
+            conn.execute(
+                "INSERT INTO leaderboard_counts (board, players)"
+                " SELECT 'wins', COUNT(*) FROM leaderboard"
+                " UNION ALL SELECT 'rate', COUNT(*) FROM leaderboard WHERE rate IS NOT NULL"
+                " UNION ALL SELECT period, COUNT(*) FROM leaderboard_periods GROUP BY period"
+            )
+            conn.execute(
+                "CREATE TRIGGER leaderboard_counts_insert AFTER INSERT ON leaderboard BEGIN"
+                " UPDATE leaderboard_counts SET players = players + 1 WHERE board = 'wins';"
+                " UPDATE leaderboard_counts SET players = players + 1 WHERE board = 'rate' AND NEW.rate IS NOT NULL;"
+                " END"
+            )
+            conn.execute(
+                "CREATE TRIGGER leaderboard_counts_rate AFTER UPDATE OF rate ON leaderboard"
+                " WHEN (OLD.rate IS NULL) != (NEW.rate IS NULL) BEGIN"
+                " UPDATE leaderboard_counts SET players = players + IIF(NEW.rate IS NULL, -1, 1) WHERE board = 'rate';"
+                " END"
+            )
+            conn.execute(
+                "CREATE TRIGGER leaderboard_counts_period AFTER INSERT ON leaderboard_periods BEGIN"
+                " INSERT OR IGNORE INTO leaderboard_counts (board, players) VALUES (NEW.period, 0);"
+                " UPDATE leaderboard_counts SET players = players + 1 WHERE board = NEW.period;"
+                " END"
+            )
+
+    def _backfill(self, conn: sqlite3.Connection):
+        """Однократно заполнить общие таблицы из уже сохранённых игроков (таблица users в той же базе)"""
+        if conn.execute("SELECT 1 FROM leaderboard LIMIT 1").fetchone() is not None:
+            return
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'users'").fetchone() is None:
+            return
+        with conn:
+            count = conn.execute(
+                "INSERT INTO leaderboard (user_id, name, wins, games, rate)"
+                " SELECT user_id, NULL, wins, total_games,"
+                " CASE WHEN total_games >= ? THEN CAST(wins AS REAL) / total_games END"
+                " FROM users WHERE total_games > 0",
+                (self.min_games,),
+            ).rowcount
+        if count:
+            logging.info(f"Таблица лидеров заполнена из базы игроков: {count}")
+
+    def _rate(self, wins: int, games: int) -> float | None:
+        return wins / games if games >= self.min_games else None
+
+    def _write(self, conn: sqlite3.Connection, totals: dict, periods: dict):
+        current = tuple(period_id(period) for period in PERIODS)
+        with conn:
+            conn.executemany(
+                "INSERT INTO leaderboard (user_id, name, wins, games, rate) VALUES (?, ?, ?, ?, ?)"
+                " ON CONFLICT (user_id) DO UPDATE SET name = COALESCE(excluded.name, name),"
+                " wins = excluded.wins, games = excluded.games, rate = excluded.rate",
+                [(user_id, name, wins, games, self._rate(wins, games))
+                 for user_id, (name, wins, games) in totals.items()],
+            )
+            conn.executemany(
+                "INSERT INTO leaderboard_periods (period, user_id, wins, games) VALUES (?, ?, ?, ?)"
+                " ON CONFLICT (period, user_id) DO UPDATE SET"
+                " wins = wins + excluded.wins, games = games + excluded.games",
+                [(period, user_id, wins, games) for (period, user_id), (wins, games) in periods.items()],
+            )
+            if current != self._current:
+                # начался новый день или неделя — прошлые периоды больше не показываются
+                keep = ', '.join('?' * len(current))
+                conn.execute(f"DELETE FROM leaderboard_periods WHERE period NOT IN ({keep})", current)
+                conn.execute(
+                    f"DELETE FROM leaderboard_counts WHERE board NOT IN ('wins', 'rate', {keep})", current,
+                )
+                self._current = current
+
+    @staticmethod
+    def _board(name: str) -> tuple[str, str, str, tuple, str]:
+        """Таблица, столбец сортировки, условие, его параметры и имя счётчика игроков;
+        порядок — по убыванию (ключ, игры, user_id)"""
+        if name == "wins":
+            return "leaderboard", "wins", "1", (), "wins"
+        if name == "rate":
+            return "leaderboard", "rate", "b.rate IS NOT NULL", (), "rate"
+        if name in PERIODS:
+            period = period_id(name)
+            return "leaderboard_periods", "wins", "b.period = ?", (period,), period
+        raise ValueError(f"Неизвестная таблица лидеров: {name!r}")
+
+    def _top(self, conn: sqlite3.Connection, name: str, n: int) -> list[Row]:
+        table, key, where, params, _ = self._board(name)
+        rows = conn.execute(
+            f"SELECT b.user_id, p.name, b.wins, b.games FROM {table} b"
+            f" LEFT JOIN leaderboard p ON p.user_id = b.user_id WHERE {where}"
+            f" ORDER BY b.{key} DESC, b.games DESC, b.user_id DESC LIMIT ?",
+            (*params, n),
+        ).fetchall()
+        return [Row(*row) for row in rows]
+
+    def _rank(self, conn: sqlite3.Connection, name: str, user_id: int) -> tuple[int | None, int] | None:
+        table, key, where, params, board = self._board(name)
+        row = conn.execute(
+            f"SELECT b.{key}, b.games FROM {table} b WHERE {where} AND b.user_id = ?", (*params, user_id),
+        ).fetchone()
+        if row is None:
+            return None
+        # по индексу, но не дальше rank_limit строк — стоимость не растёт с числом игроков
+        ahead = conn.execute(
+            f"SELECT COUNT(*) FROM (SELECT 1 FROM {table} b"
+            f" WHERE {where} AND (b.{key}, b.games, b.user_id) > (?, ?, ?) LIMIT ?)",
+            (*params, *row, user_id, self.rank_limit),
+        ).fetchone()[0]
+        total = conn.execute("SELECT players FROM leaderboard_counts WHERE board = ?", (board,)).fetchone()
+        return (ahead + 1 if ahead < self.rank_limit else None), (total[0] if total else 0)
+
+    def record(self, user_id: int, state: Any, won: bool, name: str | None = None):
+        """Учесть завершённую партию (state — уже обновлённое состояние игрока); запишется при сбросе"""
+        previous = self._totals.get(user_id)
+        self._totals[user_id] = (name or (previous[0] if previous else None), state.wins, state.total_games)
+        for period in PERIODS:
+            delta = self._periods.setdefault((period_id(period), user_id), [0, 0])
+            delta[0] += won
+            delta[1] += 1
+
+    async def top(self, name: str, n: int = 10) -> list[Row]:
+        """Первые n строк таблицы name (wins, rate, day, week) — вместе с ещё не записанными партиями"""
+        await self.flush()
+        return await asyncio.to_thread(self._db.run, lambda conn: self._top(conn, name, n))
+
+    async def rank(self, name: str, user_id: int) -> tuple[int | None, int] | None:
+        """Место игрока (с 1; None — дальше rank_limit) и число игроков в таблице; None — игрока в ней нет"""
+        await self.flush()
+        return await asyncio.to_thread(self._db.run, lambda conn: self._rank(conn, name, user_id))
+
+    async def flush(self):
+        async with self._flushing:
+            if not self._totals and not self._periods:
+                return
+            totals, periods = self._totals, self._periods
+            self._totals, self._periods = {}, {}
+            try:
+                await asyncio.to_thread(self._db.run, lambda conn: self._write(conn, totals, periods))
+            except Exception as e:
+                logging.error(f"Ошибка записи таблицы лидеров: {e}")
+                # вернуть несохранённое: свежие итоги важнее старых, приросты за период складываются
+                self._totals = {**totals, **self._totals}
+                for key, (wins, games) in periods.items():
+                    delta = self._periods.setdefault(key, [0, 0])
+                    delta[0] += wins
+                    delta[1] += games
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        await self._db.close()
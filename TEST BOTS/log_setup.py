@@ -0,0 +1,156 @@
+"""Общая настройка логирования: запись и форматирование — в фоновом потоке, а не в event loop.
+
+Хэндлер на корневом логгере только кладёт запись в очередь; файл с ротацией и консоль
+обслуживает QueueListener. Для горячих путей пишите лениво: logging.info("... %s", value).
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+
+class ColorFormatter(logging.Formatter):
+    RED = "\033[91m"
+    YELLOW = "\033[93m"
+    RESET = "\033[0m"
+
+    def format(self, record):
+        color = self.RESET
+        if record.levelno >= logging.ERROR:
+            color = self.RED
+        elif record.levelno >= logging.WARNING:
+            color = self.YELLOW
+
+        message = super().format(record)
+        return f"{color}{message}{self.RESET}"
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись — одна строка JSON"""
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        if record.exc_info:
+            data["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(data, ensure_ascii=False)
+
+
+class RateLimitFilter(logging.Filter):
+    """Не больше burst записей с одним шаблоном сообщения за interval секунд (ниже WARNING).
+
+    Подавленные записи считаются, их число дописывается к следующей пропущенной.
+    """
+
+    def __init__(self, burst: int = 20, interval: float = 60):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._windows: dict[tuple, list] = {}  # (logger, шаблон) -> [начало окна, записано, подавлено]
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        window = self._windows.get(key)
+        if window is None and len(self._windows) >= 10_000:
+            # сообщения без шаблона (f-строки) не должны раздувать словарь
+            self._windows.clear()
+        if window is None or now - window[0] >= self.interval:
+            suppressed = window[2] if window else 0
+            self._windows[key] = [now, 1, 0]
+            if suppressed:
+                record.msg = f"{record.msg} (пропущено похожих: {suppressed})"
+            return True
+        if window[1] < self.burst:
+            window[1] += 1
+            return True
+        window[2] += 1
+        return False
+
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler без форматирования в вызывающем потоке — это делает QueueListener"""
+
+    def prepare(self, record):
+        return record
+
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def setup_logging(
+    level: int = logging.INFO,
+    fmt: str = "%(asctime)s | %(levelname)s | %(name)s | %(message)s",
+    log_file: str | None = "bot.log",
+    file_level: int = logging.INFO,
+    console_level: int = logging.INFO,
+    color: bool = False,
+    json_output: bool = False,
+    max_bytes: int = 10 * 1024 * 1024,  # ротация по размеру
+    backup_count: int = 5,
+    rotate_when: str | None = None,  # например, "midnight" — ротация по времени вместо размера
+    rate_limit: tuple[int, float] | None = (20, 60),  # (burst, interval) для INFO/DEBUG
+):
+    global _listener
+    if _listener is not None:
+        return
+
+    handlers: list[logging.Handler] = []
+    if log_file:
+        if rotate_when:
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                log_file, when=rotate_when, backupCount=backup_count, encoding="utf-8")
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                log_file, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        file_handler.setLevel(file_level)
+        file_handler.setFormatter(JsonFormatter() if json_output else logging.Formatter(fmt))
+        handlers.append(file_handler)
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setLevel(console_level)
+    stream_handler.setFormatter(ColorFormatter(fmt) if color else logging.Formatter(fmt))
+    handlers.append(stream_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = DeferredQueueHandler(log_queue)
+    # записи ниже уровня всех хэндлеров даже не попадают в очередь
+    queue_handler.setLevel(min(h.level for h in handlers))
+    if rate_limit:
+        queue_handler.addFilter(RateLimitFilter(*rate_limit))
+
+    root = logging.getLogger()
+    root.handlers[:] = [queue_handler]
+    root.setLevel(max(level, queue_handler.level))
+
+    _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def _restart_in_child():
+    # после fork (webhook-воркеры) поток слушателя в дочернем процессе не существует
+    if _listener is not None:
+        _listener._thread = None
+        _listener.start()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_restart_in_child)
+
+
+def stop_logging():
+    """Дописать оставшиеся записи и остановить фоновый поток"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
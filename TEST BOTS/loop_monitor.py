@@ -0,0 +1,169 @@
+"""Диагностика event loop: задержка цикла, блокирующие вызовы и самые медленные хэндлеры.
+
+- фоновая задача каждые interval секунд замеряет, насколько позже запланированного она проснулась (лаг);
+- поток-сторож ставит в цикл пустой колбэк; если тот не выполнился за threshold секунд,
+  в лог (WARNING) пишется стек потока event loop — видно, какой код держит цикл;
+- время каждого хэндлера приходит из общего middleware metrics.handler_timing (тот же замер,
+  что и у гистограммы метрик); раз в report_interval секунд в лог уходит сводка.
+Всё пишется через обычный logging (см. log_setup.py). Накладные расходы — один колбэк и одна
+задача в цикле раз в несколько сотен миллисекунд и пара вызовов perf_counter на хэндлер.
+
+Включается в config.py:  LOOP_MONITOR = True, LOOP_BLOCK_THRESHOLD = 0.1, UVLOOP = True (если установлен).
+"""
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Callable
+
+from aiogram import Dispatcher
+
+from metrics import handler_timing
+
+logger = logging.getLogger("loop_monitor")
+
+
+def use_uvloop() -> bool:
+    """Переключить asyncio на uvloop, если он установлен"""
+    try:
+        import uvloop
+    except ImportError:
+        logger.warning("UVLOOP включён, но uvloop не установлен — используется стандартный цикл")
+        return False
+    asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    logger.info("Используется uvloop %s", uvloop.__version__)
+    return True
+
+
+def _percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+
+class LoopMonitor:
+    def __init__(
+        self,
+        threshold: float = 0.1,  # дольше — цикл считается заблокированным, пишем стек
+        interval: float = 0.5,  # период замера лага
+        report_interval: float = 300,  # период сводки в логе
+        top: int = 5,  # сколько самых медленных хэндлеров в сводке
+    ):
+        self.threshold = threshold
+        self.interval = interval
+        self.report_interval = report_interval
+        self.top = top
+        self.lag: deque[float] = deque(maxlen=int(report_interval / interval) + 1)
+        self.blocks = 0
+        self.handlers: dict[str, list] = {}  # имя -> [вызовов, сумма, максимум]
+        self.on_lag: Callable[[float], None] | None = None  # например, гистограмма из metrics.py
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._tasks: list[asyncio.Task] = []
+        self._watchdog: threading.Thread | None = None
+        self._stopping = threading.Event()
+
+    def record_handler(self, name: str, seconds: float):
+        """Хук для metrics.handler_timing: число вызовов, суммарное и максимальное время хэндлера"""
+        stats = self.handlers.get(name)
+        if stats is None:
+            stats = self.handlers[name] = [0, 0.0, 0.0]
+        stats[0] += 1
+        stats[1] += seconds
+        if seconds > stats[2]:
+            stats[2] = seconds
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self.lag.append(lag)
+            if self.on_lag is not None:
+                self.on_lag(lag)
+
+    async def _report_loop(self):
+        while True:
+            await asyncio.sleep(self.report_interval)
+            self.report()
+
+    def report(self):
+        lag = list(self.lag)
+        slowest = sorted(self.handlers.items(), key=lambda item: item[1][2], reverse=True)[:self.top]
+        logger.info(
+            "Event loop: лаг p50 %.1f мс, p99 %.1f мс, макс %.1f мс, блокировок > %.0f мс: %s",
+            _percentile(lag, 0.5) * 1000, _percentile(lag, 0.99) * 1000, max(lag, default=0) * 1000,
+            self.threshold * 1000, self.blocks,
+        )
+        if slowest:
+            logger.info("Самые медленные хэндлеры: %s", ", ".join(
+                f"{name} макс {stats[2] * 1000:.1f} мс (ср. {stats[1] / stats[0] * 1000:.1f} мс, {stats[0]} раз)"
+                for name, stats in slowest
+            ))
+        self.lag.clear()
+        self.handlers.clear()
+        self.blocks = 0
+
+    def _watch(self):
+        """Поток-сторож: проверяет, что event loop успевает выполнить колбэк за threshold"""
+        while not self._stopping.wait(self.threshold):
+            pong = threading.Event()
+            sent = time.perf_counter()
+            try:
+                self._loop.call_soon_threadsafe(pong.set)
+            except RuntimeError:  # цикл закрыт
+                return
+            if pong.wait(self.threshold):
+                continue
+            # цикл занят: стек снимаем сейчас, пока блокирующий код ещё выполняется
+            frame = sys._current_frames().get(self._loop_thread)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "(стек недоступен)"
+            while not pong.wait(1):
+                if self._stopping.is_set():
+                    return
+            self.blocks += 1
+            logger.warning("Event loop был заблокирован не меньше %.3f с, стек в момент блокировки:\n%s",
+                           time.perf_counter() - sent, stack)
+
+    def start(self):
+        if self._loop is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._stopping.clear()
+        self._tasks = [asyncio.create_task(self._sample()), asyncio.create_task(self._report_loop())]
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopping.set()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._loop = None
+
+
+def setup_loop_monitor(dp: Dispatcher, threshold: float = 0.1, **kwargs) -> LoopMonitor:
+    """Подключить монитор к диспетчеру: время хэндлеров и запуск/остановка вместе с ботом"""
+    monitor = LoopMonitor(threshold=threshold, **kwargs)
+    handler_timing(dp).hooks.append(monitor.record_handler)
+    dp["loop_monitor"] = monitor
+
+    async def on_startup(metrics=None):
+        if metrics is not None:
+            lag = metrics.add_histogram("bot_event_loop_lag_seconds", "Задержка event loop")
+            monitor.on_lag = lag.observe
+        monitor.start()
+
+    async def on_shutdown():
+        await monitor.stop()
+
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+    return monitor
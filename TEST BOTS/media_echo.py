@@ -0,0 +1,181 @@
+"""Эхо медиа без разбора по типам: copy_message вместо reply_photo/reply_audio/..., альбомы — одним copyMessages.
+
+DebugDump — выборочный отладочный дамп сообщений (выключен по умолчанию, сериализуется только доля sample).
+FileCache — LRU последних file_unique_id -> (тип, file_id), нужен для ответа без copy_message;
+после отправки по file_id в кэш записывается file_id из ответа Telegram, и следующая отправка идёт по нему.
+Политика размера фото: "largest" (как есть, копированием), "smallest" или максимальная сторона в пикселях.
+"""
+import asyncio
+import logging
+import random
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from aiogram import BaseMiddleware, Bot
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.types import Message, PhotoSize, ReplyParameters
+
+MEDIA_KINDS = ("photo", "audio", "video", "sticker", "animation", "voice", "document", "video_note")
+ALBUM_DELAY = 0.5  # части альбома приходят отдельными апдейтами — ждём остальные столько секунд
+
+logger = logging.getLogger("echo.debug")
+
+
+class DebugDump(BaseMiddleware):
+    """Outer middleware на dp.message: пишет в лог JSON случайной доли сообщений"""
+
+    def __init__(self, enabled: bool = False, sample: float = 0.01):
+        self.enabled = enabled
+        self.sample = sample
+        self.dumped = 0
+
+    def maybe_dump(self, message: Message):
+        if not self.enabled or random.random() >= self.sample:
+            return
+        self.dumped += 1
+        # дорогая сериализация — только для попавших в выборку
+        logger.info("%s", message.model_dump_json(exclude_none=True))
+
+    async def __call__(self, handler: Callable[..., Awaitable[Any]], event: Message, data: dict) -> Any:
+        self.maybe_dump(event)
+        return await handler(event, data)
+
+
+class FileRef(NamedTuple):
+    kind: str
+    file_id: str
+
+
+class FileCache:
+    """LRU: file_unique_id -> FileRef последнего увиденного файла"""
+
+    def __init__(self, capacity: int = 1024):
+        self.capacity = capacity
+        self._items: OrderedDict[str, FileRef] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, unique_id: str) -> FileRef | None:
+        ref = self._items.get(unique_id)
+        if ref is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._items.move_to_end(unique_id)
+        return ref
+
+    def put(self, unique_id: str, ref: FileRef):
+        self._items[unique_id] = ref
+        self._items.move_to_end(unique_id)
+        if len(self._items) > self.capacity:
+            self._items.popitem(last=False)
+
+
+def media_kind(message: Message) -> str | None:
+    for kind in MEDIA_KINDS:
+        if getattr(message, kind) is not None:
+            return kind
+    return None
+
+
+def file_key(message: Message, kind: str) -> str:
+    """file_unique_id, под которым файл сообщения лежит в кэше (для фото — самого большого размера)"""
+    media = message.photo[-1] if kind == "photo" else getattr(message, kind)
+    return media.file_unique_id
+
+
+def pick_photo(sizes: list[PhotoSize], policy: str | int = "largest") -> PhotoSize:
+    """Выбрать размер фото: "largest", "smallest" или наибольший, у которого сторона не больше policy px"""
+    if policy == "smallest":
+        return min(sizes, key=lambda s: s.width * s.height)
+    if policy == "largest":
+        return max(sizes, key=lambda s: s.width * s.height)
+    limit = int(policy)
+    fitting = [s for s in sizes if max(s.width, s.height) <= limit]
+    if not fitting:
+        return min(sizes, key=lambda s: s.width * s.height)
+    return max(fitting, key=lambda s: s.width * s.height)
+
+
+class MediaEcho:
+    """Один хэндлер на все типы медиа"""
+
+    def __init__(self, bot: Bot, photo_size: str | int = "largest", cache_size: int = 1024):
+        self.bot = bot
+        self.photo_size = photo_size
+        self.files = FileCache(cache_size)
+        self._albums: dict[tuple[int, str], list[int]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def remember(self, message: Message) -> FileRef | None:
+        """Положить файл сообщения в кэш; для фото — уже выбранный по политике размер"""
+        kind = media_kind(message)
+        if kind is None:
+            return None
+        key = file_key(message, kind)
+        ref = self.files.get(key)
+        if ref is None:
+            media = pick_photo(message.photo, self.photo_size) if kind == "photo" else getattr(message, kind)
+            ref = FileRef(kind, media.file_id)
+            self.files.put(key, ref)
+        return ref
+
+    def record(self, key: str, sent: Message):
+        """Запомнить file_id из ответа Telegram — следующая отправка этого файла пойдёт по нему"""
+        kind = media_kind(sent)
+        if kind is None:
+            return
+        # для фото — самый большой размер отправленного, то есть выбранный по политике
+        media = sent.photo[-1] if kind == "photo" else getattr(sent, kind)
+        self.files.put(key, FileRef(kind, media.file_id))
+
+    async def handle(self, message: Message):
+        ref = self.remember(message)
+        if message.media_group_id is not None:
+            self._collect_album(message)
+            return
+        if ref is not None and ref.kind == "photo" and self.photo_size != "largest":
+            # copy_message отправил бы все размеры — нужен конкретный file_id
+            await self.reply_file(message, ref)
+            return
+        try:
+            await message.copy_to(message.chat.id, reply_parameters=ReplyParameters(message_id=message.message_id))
+        except TelegramBadRequest as e:
+            # например, защищённый от пересылки контент — отправляем файл заново по file_id
+            if ref is None:
+                raise
+            logging.warning("copy_message не удался (%s), отправляем по file_id", e.message)
+            await self.reply_file(message, ref)
+
+    async def reply_file(self, message: Message, ref: FileRef):
+        kwargs: dict = {}
+        if ref.kind not in ("sticker", "video_note") and message.caption:
+            kwargs = {"caption": message.caption, "caption_entities": message.caption_entities, "parse_mode": None}
+        sent = await getattr(message, f"reply_{ref.kind}")(ref.file_id, **kwargs)
+        self.record(file_key(message, ref.kind), sent)
+
+    def _collect_album(self, message: Message):
+        key = (message.chat.id, message.media_group_id)
+        parts = self._albums.get(key)
+        if parts is None:
+            parts = self._albums[key] = []
+            task = asyncio.create_task(self._flush_album(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        parts.append(message.message_id)
+
+    async def _flush_album(self, key: tuple[int, str]):
+        # ждём, пока части альбома перестанут приходить
+        seen = -1
+        while seen != len(self._albums[key]):
+            seen = len(self._albums[key])
+            await asyncio.sleep(ALBUM_DELAY)
+        chat_id, _ = key
+        message_ids = sorted(self._albums.pop(key))
+        try:
+            await self.bot.copy_messages(chat_id, from_chat_id=chat_id, message_ids=message_ids)
+        except Exception as e:
+            logging.error("Не удалось отправить альбом в %s: %s", chat_id, e)
@@ -0,0 +1,234 @@
+"""Метрики ботов в формате Prometheus: задержки хэндлеров, ошибки, запросы к Bot API и GamerPower.
+
+Включаются через METRICS_ENABLED = True в config.py (см. launcher.run_bot), страница — http://host:METRICS_PORT/metrics.
+Если метрики выключены, ничего не регистрируется и накладных расходов нет.
+"""
+import bisect
+import contextvars
+import time
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware, Bot, Dispatcher
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiohttp import web
+
+# границы корзин гистограмм, секунды
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = buckets
+        self._series: dict[tuple, list] = {}  # значения меток -> [counts..., sum, count]
+
+    def observe(self, value: float, *labels: str):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [0] * (len(self.buckets) + 3)
+        series[bisect.bisect_left(self.buckets, value)] += 1
+        series[-2] += value
+        series[-1] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, series in self._series.items():
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, labels))
+            sep = "," if base else ""
+            total = 0
+            for bound, count in zip((*self.buckets, "+Inf"), series):
+                total += count
+                lines.append(f'{self.name}_bucket{{{base}{sep}le="{bound}"}} {total}')
+            suffix = f"{{{base}}}" if base else ""
+            lines.append(f"{self.name}_sum{suffix} {series[-2]}")
+            lines.append(f"{self.name}_count{suffix} {series[-1]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, *labels: str, value: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for labels, value in self._values.items():
+            base = ",".join(f'{k}="{v}"' for k, v in zip(self.labels, labels))
+            lines.append(f"{self.name}{{{base}}} {value}" if base else f"{self.name} {value}")
+        return lines
+
+
+class Gauge:
+    """Текущее значение, читается в момент запроса /metrics"""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = name
+        self.help = help
+        self.read = read
+
+    def render(self) -> list[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {self.read()}"]
+
+
+# время в хэндлере текущего апдейта — чтобы внешний middleware вычел его и получил время фильтров
+_handler_time: contextvars.ContextVar[list] = contextvars.ContextVar("handler_time")
+# имя, под которым записать текущий хэндлер, если он сам его уточнил (см. name_handler)
+_handler_name: contextvars.ContextVar[list] = contextvars.ContextVar("handler_name")
+
+
+def name_handler(name: str):
+    """Уточнить имя текущего хэндлера для замеров: хэндлер-диспетчер (routing.RoutingTable) вызывает
+    выбранный маршрут, и без этого все замеры попали бы под имя диспетчера"""
+    box = _handler_name.get(None)
+    if box is not None:
+        box[0] = name
+
+
+class Metrics:
+    def __init__(self):
+        self.update_seconds = Histogram("bot_update_seconds", "Полное время обработки апдейта", ("type",))
+        self.handler_seconds = Histogram("bot_handler_seconds", "Время работы хэндлера", ("handler",))
+        self.filter_seconds = Histogram("bot_filter_seconds", "Время подбора хэндлера (фильтры, middleware)")
+        self.errors = Counter("bot_errors_total", "Необработанные исключения в хэндлерах", ("exception",))
+        self.api_seconds = Histogram("bot_api_request_seconds", "Запросы к Telegram Bot API", ("method",))
+        self.upstream_seconds = Histogram("bot_upstream_seconds", "Запросы к GamerPower", ("source", "status"))
+        self.all = [self.update_seconds, self.handler_seconds, self.filter_seconds,
+                    self.errors, self.api_seconds, self.upstream_seconds]
+
+    def add_histogram(self, name: str, help: str, labels: tuple[str, ...] = (), buckets: tuple = BUCKETS) -> Histogram:
+        """Дополнительная гистограмма (например, лаг event loop из loop_monitor.py)"""
+        histogram = Histogram(name, help, labels, buckets)
+        self.all.append(histogram)
+        return histogram
+
+    def add_counter(self, name: str, help: str, labels: tuple[str, ...] = ()) -> Counter:
+        counter = Counter(name, help, labels)
+        self.all.append(counter)
+        return counter
+
+    def add_gauge(self, name: str, help: str, read: Callable[[], float]) -> Gauge:
+        gauge = Gauge(name, help, read)
+        self.all.append(gauge)
+        return gauge
+
+    def observe_upstream(self, source: str, status: int, seconds: float):
+        self.upstream_seconds.observe(seconds, source, str(status))
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self.all for line in metric.render()) + "\n"
+
+
+class UpdateMetricsMiddleware(BaseMiddleware):
+    """Внешний middleware на update: общее время, время фильтров и ошибки"""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(self, handler: Callable[..., Awaitable[Any]], event: Any, data: dict) -> Any:
+        handler_time = [0.0]
+        token = _handler_time.set(handler_time)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception as e:
+            self.metrics.errors.inc(type(e).__name__)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            _handler_time.reset(token)
+            self.metrics.update_seconds.observe(elapsed, getattr(event, "event_type", "unknown"))
+            self.metrics.filter_seconds.observe(max(0.0, elapsed - handler_time[0]))
+
+
+class HandlerMetricsMiddleware(BaseMiddleware):
+    """Внутренний middleware: время конкретного хэндлера (после того как фильтры совпали).
+
+    Один на диспетчер (см. handler_timing): замер отдаётся всем хукам (имя, секунды) —
+    гистограмме метрик и сводке медленных хэндлеров loop_monitor.py.
+    """
+
+    def __init__(self):
+        self.hooks: list[Callable[[str, float], None]] = []
+
+    async def __call__(self, handler: Callable[..., Awaitable[Any]], event: Any, data: dict) -> Any:
+        name_box = [None]
+        token = _handler_name.set(name_box)
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        finally:
+            elapsed = time.perf_counter() - started
+            _handler_name.reset(token)
+            name = name_box[0]
+            if name is None:
+                handler_object = data.get("handler")
+                name = getattr(getattr(handler_object, "callback", None), "__name__", "unknown")
+            for hook in self.hooks:
+                hook(name, elapsed)
+            handler_time = _handler_time.get(None)
+            if handler_time is not None:
+                handler_time[0] += elapsed
+
+
+class RequestMetricsMiddleware(BaseRequestMiddleware):
+    """Middleware сессии бота: длительность каждого вызова Bot API"""
+
+    def __init__(self, metrics: Metrics):
+        self.metrics = metrics
+
+    async def __call__(self, make_request, bot, method):
+        started = time.perf_counter()
+        try:
+            return await make_request(bot, method)
+        finally:
+            self.metrics.api_seconds.observe(time.perf_counter() - started, type(method).__name__)
+
+
+def handler_timing(dp: Dispatcher) -> HandlerMetricsMiddleware:
+    """Общий middleware времени хэндлеров: ставится на диспетчер один раз, остальные добавляют хуки"""
+    timing = dp.workflow_data.get("handler_timing")
+    if timing is None:
+        timing = dp["handler_timing"] = HandlerMetricsMiddleware()
+        for observer in dp.observers.values():
+            if observer.event_name not in ("update", "error"):
+                observer.middleware(timing)
+    return timing
+
+
+def setup_metrics(dp: Dispatcher, bot: Bot, host: str = "127.0.0.1", port: int = 9100) -> Metrics:
+    """Подключить метрики к диспетчеру и боту и поднять страницу /metrics на время работы"""
+    metrics = Metrics()
+    dp.update.outer_middleware(UpdateMetricsMiddleware(metrics))
+    handler_timing(dp).hooks.append(lambda name, seconds: metrics.handler_seconds.observe(seconds, name))
+    bot.session.middleware(RequestMetricsMiddleware(metrics))
+    # доступны хэндлерам и startup-хукам как аргумент metrics
+    dp["metrics"] = metrics
+
+    runner: web.AppRunner | None = None
+
+    async def metrics_page(request: web.Request) -> web.Response:
+        return web.Response(text=metrics.render(), content_type="text/plain", charset="utf-8")
+
+    async def start_server(worker_index: int = 0):
+        nonlocal runner
+        app = web.Application()
+        app.router.add_get("/metrics", metrics_page)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        # у каждого webhook-процесса свой порт: port, port + 1, ...
+        await web.TCPSite(runner, host, port + worker_index).start()
+
+    async def stop_server():
+        if runner is not None:
+            await runner.cleanup()
+
+    dp.startup.register(start_server)
+    dp.shutdown.register(stop_server)
+    return metrics
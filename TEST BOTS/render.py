@@ -0,0 +1,147 @@
+import re
+from typing import Awaitable, Callable, Iterable, Iterator
+
+MESSAGE_LIMIT = 4096  # максимальная длина сообщения Telegram
+
+_TOKEN = re.compile(r"(<[^>]*>)|([^<]+)")
+_TAG_NAME = re.compile(r"</?\s*([a-zA-Z0-9-]+)")
+
+
+def _cut_point(text: str, size: int) -> int:
+    """Где резать текст не длиннее size: по переводу строки / пробелу и не внутри &entity; (0 — нигде)"""
+    if len(text) <= size:
+        return len(text)
+    cut = max(text.rfind("\n", 0, size), text.rfind(" ", 0, size))
+    if cut <= 0:
+        cut = size
+    amp = text.rfind("&", 0, cut)
+    if amp != -1 and ";" not in text[amp:cut]:
+        cut = amp
+    return cut
+
+
+def split_html(text: str, limit: int = MESSAGE_LIMIT) -> Iterator[str]:
+    """Разбить HTML на части не длиннее limit, не разрывая теги.
+
+    Открытые на границе теги закрываются в конце части и открываются заново в следующей.
+    В каждой части есть текст: тег не открывается, если после него не влезает ни символа,
+    а пробелы на границе частей отбрасываются (Telegram всё равно их обрезает).
+    """
+    if len(text) <= limit:
+        yield text
+        return
+
+    parts: list[str] = []
+    size = 0
+    has_text = False  # в части есть текст, а не только заново открытые теги
+    stack: list[tuple[str, str]] = []  # (имя, открывающий тег)
+
+    def closing_size() -> int:
+        return sum(len(name) + 3 for name, _ in stack)  # </name>
+
+    def flush() -> str:
+        nonlocal parts, size, has_text
+        chunk = "".join(parts) + "".join(f"</{name}>" for name, _ in reversed(stack))
+        parts = [tag for _, tag in stack]
+        size = sum(map(len, parts))
+        has_text = False
+        return chunk
+
+    for tag, chunk in _TOKEN.findall(text):
+        if tag:
+            match = _TAG_NAME.match(tag)
+            name = match.group(1) if match is not None else None
+            if tag.startswith("</") and stack and stack[-1][0] == name:
+                if parts and parts[-1] == stack[-1][1]:
+                    # после открывающего тега ничего нет (он только что открыт заново) — пустая пара не нужна
+                    parts.pop()
+                    size -= len(stack[-1][1])
+                else:
+                    # место под него уже было оставлено в closing_size
+                    parts.append(f"</{name}>")
+                    size += len(name) + 3
+                stack.pop()
+                continue
+            opening = name is not None and not tag.startswith("</") and not tag.endswith("/>")
+            # открывающему тегу нужно место и для своего закрывающего, и хотя бы для одного символа текста
+            needed = len(tag) + (len(name) + 3 + 1 if opening else 0)
+            if size + needed + closing_size() > limit and has_text:
+                yield flush()
+            parts.append(tag)
+            size += len(tag)
+            if opening:
+                stack.append((name, tag))
+            continue
+
+        while chunk:
+            if not has_text:
+                chunk = chunk.lstrip()
+                if not chunk:
+                    break
+            room = limit - size - closing_size()
+            cut = _cut_point(chunk, room) if room > 0 else 0
+            if cut == 0:
+                if has_text:
+                    yield flush()
+                    continue
+                # не влезает даже в пустую часть (очень глубокая вложенность) — режем как есть
+                cut = max(1, room)
+            parts.append(chunk[:cut])
+            size += cut
+            has_text = True
+            chunk = chunk[cut:]
+            if chunk:
+                yield flush()
+
+    if has_text:
+        yield "".join(parts) + "".join(f"</{name}>" for name, _ in reversed(stack))
+
+
+def paginate(chunks: Iterable[str], header: str = "", limit: int = MESSAGE_LIMIT) -> Iterator[str]:
+    """Упаковать готовые фрагменты в сообщения не длиннее limit (генератор)"""
+    page: list[str] = [header] if header else []
+    size = len(header)
+    for chunk in chunks:
+        for part in split_html(chunk, limit):
+            if size + len(part) > limit and page:
+                yield "".join(page)
+                page, size = [], 0
+            page.append(part)
+            size += len(part)
+    if page:
+        yield "".join(page)
+
+
+class PageBook:
+    """Страницы, которые рендерятся лениво и запоминаются.
+
+    Первый читатель получает страницу сразу после её рендера, следующие — из памяти.
+    """
+
+    def __init__(self, pages: Iterable[str]):
+        self._source = iter(pages)
+        self._pages: list[str] = []
+        self._done = False
+
+    def __iter__(self) -> Iterator[str]:
+        i = 0
+        while True:
+            if i < len(self._pages):
+                yield self._pages[i]
+                i += 1
+            elif self._done:
+                return
+            else:
+                try:
+                    self._pages.append(next(self._source))
+                except StopIteration:
+                    self._done = True
+
+    def all(self) -> list[str]:
+        return list(self)
+
+
+async def send_pages(send: Callable[[str], Awaitable], pages: Iterable[str]):
+    """Отправлять страницы по мере готовности"""
+    for page in pages:
+        await send(page)
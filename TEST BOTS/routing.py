@@ -0,0 +1,86 @@
+"""Таблица маршрутизации текстовых сообщений: один хэндлер в Dispatcher вместо цепочки фильтров.
+
+Текст разбирается один раз, маршрут ищется по словарю (команды, фразы) или по диапазону
+(числа), поэтому стоимость не растёт с числом зарегистрированных хэндлеров.
+Хэндлер получает уже загруженное состояние пользователя в аргументе user.
+Метрики и сводка медленных хэндлеров видят имя выбранного хэндлера, а не dispatch (metrics.name_handler).
+"""
+from typing import Any, Awaitable, Callable, NamedTuple
+
+from aiogram.types import Message
+
+from metrics import name_handler
+
+Handler = Callable[..., Awaitable[Any]]
+
+
+class Route(NamedTuple):
+    handler: Handler
+    user: str | None  # "get" — создать состояние при необходимости, "peek" — только прочитать, None — не нужно
+
+
+class RoutingTable:
+    def __init__(
+        self,
+        get_user: Callable[[int], Awaitable[Any]] | None = None,
+        peek_user: Callable[[int], Awaitable[Any]] | None = None,
+    ):
+        self._loaders = {"get": get_user, "peek": peek_user}
+        self._commands: dict[str, Route] = {}
+        self._texts: dict[str, Route] = {}
+        self._numbers: list[tuple[int, int, Route]] = []
+        self._default: Route | None = None
+
+    def command(self, *names: str, user: str | None = None):
+        def decorator(handler: Handler) -> Handler:
+            for name in names:
+                self._commands[name.lower()] = Route(handler, user)
+            return handler
+        return decorator
+
+    def text(self, *variants: str, user: str | None = None):
+        def decorator(handler: Handler) -> Handler:
+            for variant in variants:
+                self._texts[variant.strip().lower()] = Route(handler, user)
+            return handler
+        return decorator
+
+    def number(self, low: int, high: int, user: str | None = None):
+        def decorator(handler: Handler) -> Handler:
+            self._numbers.append((low, high, Route(handler, user)))
+            return handler
+        return decorator
+
+    def default(self, user: str | None = None):
+        def decorator(handler: Handler) -> Handler:
+            self._default = Route(handler, user)
+            return handler
+        return decorator
+
+    def resolve(self, text: str | None) -> tuple[Route | None, dict]:
+        """Найти маршрут по тексту; второй элемент — доп. аргументы хэндлера (args / number)"""
+        if text:
+            if text[0] == "/":
+                command, _, args = text[1:].partition(" ")
+                route = self._commands.get(command.partition("@")[0].lower())
+                if route is not None:
+                    return route, {"args": args.strip() or None}
+            else:
+                route = self._texts.get(text.strip().lower())
+                if route is not None:
+                    return route, {}
+                if text.isdigit():
+                    number = int(text)
+                    for low, high, route in self._numbers:
+                        if low <= number <= high:
+                            return route, {"number": number}
+        return self._default, {}
+
+    async def dispatch(self, message: Message) -> Any:
+        route, kwargs = self.resolve(message.text)
+        if route is None:
+            return None
+        name_handler(route.handler.__name__)
+        if route.user is not None:
+            kwargs["user"] = await self._loaders[route.user](message.from_user.id)
+        return await route.handler(message, **kwargs)
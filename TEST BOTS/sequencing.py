@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from aiogram import BaseMiddleware
+
+
+class _Slot:
+    __slots__ = ("lock", "users")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0  # сколько апдейтов держат или ждут этот замок
+
+
+class ChatSequencer(BaseMiddleware):
+    """Апдейты одного чата обрабатываются строго по очереди, разных чатов — параллельно.
+
+    Замок живёт, только пока у чата есть необработанные апдейты, поэтому память не растёт
+    с числом пользователей (в отличие от SimpleEventIsolation из aiogram).
+    Регистрировать как outer middleware на dp.update.
+    """
+
+    def __init__(self):
+        self._slots: dict[int, _Slot] = {}
+
+    @property
+    def active(self) -> int:
+        return len(self._slots)
+
+    async def __call__(self, handler: Callable[..., Awaitable[Any]], event: Any, data: dict) -> Any:
+        chat = data.get("event_chat")
+        user = data.get("event_from_user")
+        key = chat.id if chat is not None else user.id if user is not None else None
+        if key is None:
+            return await handler(event, data)
+
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = _Slot()
+        slot.users += 1
+        try:
+            # asyncio.Lock будит ожидающих в порядке очереди — порядок апдейтов сохраняется
+            async with slot.lock:
+                return await handler(event, data)
+        finally:
+            slot.users -= 1
+            if slot.users == 0:
+                del self._slots[key]
@@ -0,0 +1,256 @@
+"""Многопроцессный запуск бота: супервизор принимает апдейты и раздаёт их N воркерам по chat_id % N.
+
+Все апдейты одного чата попадают в один и тот же процесс, поэтому состояние пользователей
+(например, users в bot_guess_the_number.py) остаётся локальным для шарда. Фоновые сервисы
+(опрос раздач и т.п.) запускаются только в воркере 0 — startup-хуки получают is_primary.
+Метрики, монитор event loop и uvloop подключаются в каждом воркере (страница метрик шарда i —
+на порту METRICS_PORT + i). Общее для всех шардов состояние должно жить вне процесса: таблицы
+лидеров угадайки лежат в SQLite (leaderboard.py), и /top одинаков в любом шарде.
+
+Включается в config.py:  BOT_MODE = "sharded", SHARDS = 4, SHARD_INGRESS = "polling" или "webhook".
+"""
+import asyncio
+import importlib.util
+import logging
+import multiprocessing
+import queue
+import signal
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+from aiogram import Bot
+from aiogram.types import Update
+from aiohttp import web
+
+HEARTBEAT_INTERVAL = 1.0  # как часто воркер отмечается, сек
+HEARTBEAT_TIMEOUT = 15.0  # воркер без отметок дольше — считается зависшим и перезапускается
+STARTUP_GRACE = 60.0  # на импорт и startup-хуки воркеру даётся больше времени
+DRAIN_TIMEOUT = 30.0  # сколько ждать завершения обработки при остановке
+
+_CHAT_PATHS = (
+    ("message", "chat"), ("edited_message", "chat"), ("channel_post", "chat"),
+    ("edited_channel_post", "chat"), ("my_chat_member", "chat"), ("chat_member", "chat"),
+    ("chat_join_request", "chat"), ("callback_query", "message", "chat"),
+)
+_USER_PATHS = (("callback_query", "from"), ("inline_query", "from"), ("chosen_inline_result", "from"),
+               ("pre_checkout_query", "from"), ("shipping_query", "from"), ("poll_answer", "user"))
+
+
+def shard_key(update: dict) -> int:
+    """id чата апдейта (или пользователя, если чата нет)"""
+    for path in (*_CHAT_PATHS, *_USER_PATHS):
+        node: Any = update
+        for part in path:
+            node = node.get(part) if isinstance(node, dict) else None
+            if node is None:
+                break
+        else:
+            if isinstance(node, dict) and "id" in node:
+                return node["id"]
+    return 0
+
+
+def update_payload(update: Update) -> dict:
+    """Апдейт из getUpdates в JSON для очереди шарда — с ключами Telegram ("from", а не "from_user"),
+    как у webhook, иначе shard_key не найдёт пользователя"""
+    return update.model_dump(mode="json", exclude_none=True, by_alias=True)
+
+
+def load_bot_module(path: str):
+    # при spawn файл бота уже выполнен в воркере как __mp_main__ — второй раз не грузим
+    main = sys.modules.get("__mp_main__")
+    if main is not None and Path(getattr(main, "__file__", "")).resolve() == Path(path).resolve():
+        return main
+    spec = importlib.util.spec_from_file_location(f"shard_{Path(path).stem}", path)
+    module = importlib.util.module_from_spec(spec)
+    sys.path.insert(0, str(Path(path).parent))
+    spec.loader.exec_module(module)
+    return module
+
+
+# ---------- воркер ----------
+
+async def _worker_loop(path: str, index: int, updates: multiprocessing.Queue, heartbeats):
+    from launcher import setup_instrumentation, use_api_server
+
+    module = load_bot_module(path)
+    dp, bot = module.dp, module.bot
+    use_api_server(bot)
+    setup_instrumentation(dp, bot)
+    dp["is_primary"] = index == 0
+    dp["worker_index"] = index
+    # как start_polling: хуки получают workflow_data (is_primary, worker_index, metrics, ...)
+    await dp.emit_startup(bot=bot, **dp.workflow_data)
+
+    loop = asyncio.get_running_loop()
+    in_flight: set[asyncio.Task] = set()
+
+    async def heartbeat():
+        while True:
+            heartbeats[index] = time.time()
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+
+    beat = asyncio.create_task(heartbeat())
+    try:
+        while True:
+            item = await loop.run_in_executor(None, updates.get)
+            if item is None:  # сигнал остановки от супервизора
+                break
+            task = asyncio.create_task(dp.feed_update(bot, Update.model_validate(item)))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+        if in_flight:
+            logging.info("Шард %s: дожидаемся %s апдейтов", index, len(in_flight))
+            await asyncio.wait(in_flight, timeout=DRAIN_TIMEOUT)
+    finally:
+        beat.cancel()
+        await dp.emit_shutdown(bot=bot, **dp.workflow_data)
+        await bot.session.close()
+
+
+def _worker_main(path: str, index: int, updates: multiprocessing.Queue, heartbeats):
+    # останавливает супервизор (через None в очереди)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    from launcher import use_event_loop_policy
+    use_event_loop_policy()
+    asyncio.run(_worker_loop(path, index, updates, heartbeats))
+
+
+# ---------- супервизор ----------
+
+class Supervisor:
+    def __init__(self, bot_path: str, bot: Bot, shards: int = 4, ingress: str = "polling"):
+        self.bot_path = bot_path
+        self.bot = bot
+        self.shards = shards
+        self.ingress = ingress
+        self._ctx = multiprocessing.get_context("spawn")
+        self._heartbeats = self._ctx.Array("d", shards, lock=False)
+        self._queues: list[multiprocessing.Queue] = [self._ctx.Queue() for _ in range(shards)]
+        self._processes: list[multiprocessing.Process | None] = [None] * shards
+        self._stopping = asyncio.Event()
+
+    def _start_worker(self, index: int):
+        self._heartbeats[index] = time.time() + STARTUP_GRACE
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(self.bot_path, index, self._queues[index], self._heartbeats),
+            name=f"shard-{index}",
+        )
+        # Ctrl+C в терминале приходит всей группе процессов — воркеры его игнорируют с самого старта
+        previous = signal.signal(signal.SIGINT, signal.SIG_IGN)
+        try:
+            process.start()
+        finally:
+            signal.signal(signal.SIGINT, previous)
+        self._processes[index] = process
+        logging.info("Шард %s запущен (pid %s)", index, process.pid)
+
+    def _restart_worker(self, index: int, reason: str):
+        logging.warning("Шард %s перезапускается: %s", index, reason)
+        process = self._processes[index]
+        if process is not None and process.is_alive():
+            process.kill()
+            process.join()
+        # недоставленные апдейты переносим в новую очередь — старую мог сломать убитый процесс
+        old, new = self._queues[index], self._ctx.Queue()
+        while True:
+            try:
+                item = old.get_nowait()
+            except (queue.Empty, OSError, ValueError):
+                break
+            if item is not None:
+                new.put(item)
+        self._queues[index] = new
+        self._start_worker(index)
+
+    def dispatch(self, update: dict):
+        self._queues[shard_key(update) % self.shards].put(update)
+
+    async def _health_loop(self):
+        while not self._stopping.is_set():
+            await asyncio.sleep(HEARTBEAT_INTERVAL * 2)
+            now = time.time()
+            for index, process in enumerate(self._processes):
+                if self._stopping.is_set():
+                    return
+                if process is None or not process.is_alive():
+                    self._restart_worker(index, f"процесс завершился (код {getattr(process, 'exitcode', None)})")
+                elif now - self._heartbeats[index] > HEARTBEAT_TIMEOUT:
+                    self._restart_worker(index, "нет heartbeat")
+
+    async def _poll(self):
+        await self.bot.delete_webhook()
+        offset = None
+        while not self._stopping.is_set():
+            try:
+                updates = await self.bot.get_updates(offset=offset, timeout=10)
+            except Exception as e:
+                logging.error("Ошибка getUpdates: %s", e)
+                await asyncio.sleep(1)
+                continue
+            for update in updates:
+                offset = update.update_id + 1
+                self.dispatch(update_payload(update))
+
+    async def _serve_webhook(self):
+        from launcher import setting
+
+        path = setting("WEBHOOK_PATH", "/webhook")
+        secret = setting("WEBHOOK_SECRET") or None
+        url = setting("WEBHOOK_URL")
+
+        async def handle(request: web.Request) -> web.Response:
+            if secret and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != secret:
+                return web.Response(status=401)
+            self.dispatch(await request.json())
+            return web.Response()
+
+        app = web.Application()
+        app.router.add_post(path, handle)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, setting("WEBHOOK_HOST", "0.0.0.0"), setting("WEBHOOK_PORT", 8080)).start()
+        if url:
+            await self.bot.set_webhook(f"{url.rstrip('/')}{path}", secret_token=secret)
+        try:
+            await self._stopping.wait()
+        finally:
+            await runner.cleanup()
+
+    async def _stop(self):
+        logging.info("Остановка: дожидаемся шардов")
+        for q in self._queues:
+            q.put(None)
+        deadline = time.monotonic() + DRAIN_TIMEOUT + 5
+        for process in self._processes:
+            if process is not None:
+                await asyncio.to_thread(process.join, max(0.0, deadline - time.monotonic()))
+                if process.is_alive():
+                    process.kill()
+        await self.bot.session.close()
+
+    async def run_async(self):
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stopping.set)
+            except NotImplementedError:  # Windows
+                pass
+
+        for index in range(self.shards):
+            self._start_worker(index)
+        health = asyncio.create_task(self._health_loop())
+        ingress = asyncio.create_task(self._poll() if self.ingress == "polling" else self._serve_webhook())
+        logging.info("Супервизор: %s шардов, приём апдейтов — %s", self.shards, self.ingress)
+
+        await self._stopping.wait()
+        ingress.cancel()
+        health.cancel()
+        await asyncio.gather(ingress, health, return_exceptions=True)
+        await self._stop()
+
+    def run(self):
+        asyncio.run(self.run_async())
@@ -0,0 +1,59 @@
+"""Общая обёртка SQLite для хранилищ ботов: одно соединение на файл (WAL), запросы — вне event loop.
+
+Соединение открывается при первом запросе: pragmas, затем schema (CREATE TABLE IF NOT EXISTS ...),
+затем on_open(conn) — однократные миграции и заполнение. Потоки asyncio.to_thread разные,
+поэтому соединение используется под замком. Методы execute / fetch / run блокирующие —
+хранилища вызывают их через asyncio.to_thread.
+"""
+import asyncio
+import sqlite3
+import threading
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class SqliteDB:
+    def __init__(self, path: str, schema: str = "", on_open: Callable[[sqlite3.Connection], None] | None = None):
+        self.path = path
+        self.schema = schema
+        self.on_open = on_open
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if self.schema:
+                conn.executescript(self.schema)
+            self._conn = conn
+            if self.on_open is not None:
+                self.on_open(conn)
+        return self._conn
+
+    def run(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Выполнить fn(conn) под замком соединения — для нескольких запросов подряд"""
+        with self._lock:
+            return fn(self._connect())
+
+    def execute(self, sql: str, params: Any = (), many: bool = False) -> int:
+        """Один запрос (или executemany) в своей транзакции; возвращает rowcount"""
+        def _execute(conn: sqlite3.Connection) -> int:
+            with conn:
+                cursor = conn.executemany(sql, params) if many else conn.execute(sql, params)
+                return cursor.rowcount
+        return self.run(_execute)
+
+    def fetch(self, sql: str, params: Any = ()) -> list:
+        return self.run(lambda conn: conn.execute(sql, params).fetchall())
+
+    def _close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def close(self):
+        await asyncio.to_thread(self._close)
@@ -0,0 +1,125 @@
+"""Замер холодного старта бота по фазам и отложенная инициализация.
+
+Импортируйте модуль первым в файле бота — с этого момента идёт отсчёт фаз:
+interpreter (запуск Python до импорта модуля, только Linux), imports, config,
+startup (startup-хуки), first_getupdates (отправлен первый getUpdates) или first_update (webhook).
+Тяжёлую загрузку состояния запускайте через warm_up — она идёт в фоне и замеряется отдельно.
+
+Необязательные настройки в config.py:
+STARTUP_DEFERRED = True     # False — дожидаться загрузки состояния до приёма апдейтов
+STARTUP_REPORT = None       # путь к JSON-файлу, куда дописывается отчёт каждого запуска
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable
+
+_STARTED = time.perf_counter()
+
+
+def _process_age() -> float | None:
+    """Сколько секунд назад запущен процесс (по /proc), None — если узнать нельзя"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rpartition(")")[2].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return max(0.0, uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+class StartupProfiler:
+    def __init__(self):
+        self.phases: dict[str, float] = {}
+        self.background: dict[str, float] = {}  # фоновая загрузка — не на пути к первому апдейту
+        self.reported = False
+        self._last = _STARTED
+        interpreter = _process_age()
+        if interpreter is not None:
+            self.phases["interpreter"] = interpreter
+
+    def mark(self, phase: str):
+        """Закрыть фазу: время с конца предыдущей"""
+        now = time.perf_counter()
+        self.phases[phase] = now - self._last
+        self._last = now
+
+    @contextmanager
+    def measure(self, name: str):
+        """Замерить фоновую работу (загрузка состояния и т.п.)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.background[name] = time.perf_counter() - started
+            logging.info("Фоновая загрузка %s: %.3f с", name, self.background[name])
+
+    @property
+    def total(self) -> float:
+        return sum(self.phases.values())
+
+    def report(self, phase: str):
+        """Закрыть последнюю фазу и один раз вывести итог"""
+        if self.reported:
+            return
+        self.reported = True
+        self.mark(phase)
+        logging.info(
+            "Холодный старт: %.3f с (%s)",
+            self.total, ", ".join(f"{name} {seconds:.3f}" for name, seconds in self.phases.items()),
+        )
+        from launcher import setting
+        path = setting("STARTUP_REPORT")
+        if path:
+            record = {"time": time.time(), "pid": os.getpid(), "total": self.total, **self.phases}
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+
+    def install(self, dp, bot):
+        """Подключить замер первого getUpdates и первого апдейта"""
+        from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+        from aiogram.methods import GetUpdates
+
+        profiler = self
+
+        class FirstGetUpdates(BaseRequestMiddleware):
+            async def __call__(self, make_request, bot, method):
+                # момент отправки, а не ответа: без апдейтов ответ ждёт long polling timeout
+                if isinstance(method, GetUpdates):
+                    profiler.report("first_getupdates")
+                return await make_request(bot, method)
+
+        async def first_update(handler, event, data):
+            profiler.report("first_update")
+            return await handler(event, data)
+
+        async def on_startup():
+            profiler.mark("startup")
+
+        bot.session.middleware(FirstGetUpdates())
+        dp.update.outer_middleware(first_update)
+        # после остальных startup-хуков бота
+        dp.startup.register(on_startup)
+        self.mark("config")
+
+
+profiler = StartupProfiler()
+
+
+async def warm_up(name: str, load: Callable[[], Awaitable[Any]], deferred: bool = True) -> asyncio.Task:
+    """Загрузить состояние: в фоне (deferred) или сразу, до приёма апдейтов.
+
+    Возвращает задачу — её можно дождаться там, где состояние уже необходимо.
+    """
+    async def run():
+        with profiler.measure(name):
+            return await load()
+
+    task = asyncio.create_task(run(), name=f"warm-up:{name}")
+    if not deferred:
+        await task
+    return task
@@ -0,0 +1,8 @@
+"""Модули ботов лежат плоско в TEST BOTS/ — делаем их импортируемыми из тестов.
+
+Тесты не ходят в сеть и не требуют config.py с токеном: Bot API подменяется фейковой сессией.
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
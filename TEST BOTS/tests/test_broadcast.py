@@ -0,0 +1,118 @@
+import asyncio
+import time
+from collections import Counter
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+from broadcast import BroadcastStore, Broadcaster
+
+
+class FakeBot:
+    """Считает доставленные сообщения; fail — сколько раз подряд падать для чата (-1 — всегда)"""
+
+    def __init__(self, fail: dict[int, int] | None = None):
+        self.sent: list[int] = []
+        self.fail = fail or {}
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await asyncio.sleep(0.001)
+        left = self.fail.get(chat_id, 0)
+        if left:
+            self.fail[chat_id] = left - 1
+            raise ConnectionResetError("connection reset")
+        self.sent.append(chat_id)
+
+
+def broadcaster(bot, store):
+    return Broadcaster(bot, store, rate=1e6, per_chat_rate=1e6, workers=10, checkpoint_every=100, retry_delay=0)
+
+
+def test_cancel_then_resume_sends_no_duplicates(tmp_path):
+    async def scenario():
+        store = BroadcastStore(str(tmp_path / "broadcast.sqlite3"))
+        for chat_id in range(1, 301):
+            await store.subscribe(chat_id)
+        broadcast_id = await store.create(["hello"])
+
+        bot = FakeBot()
+        task = asyncio.create_task(broadcaster(bot, store).run(broadcast_id, ["hello"]))
+        while len(bot.sent) < 134:
+            await asyncio.sleep(0.001)
+        task.cancel()  # как on_shutdown при остановке бота
+        await asyncio.gather(task, return_exceptions=True)
+        assert 134 <= len(bot.sent) < 300
+
+        await broadcaster(bot, store).resume()
+        assert Counter(bot.sent) == Counter(range(1, 301))
+        assert await store.pending() == []
+        await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_transient_errors_are_retried_not_dropped(tmp_path):
+    async def scenario():
+        store = BroadcastStore(str(tmp_path / "broadcast.sqlite3"))
+        for chat_id in range(1, 11):
+            await store.subscribe(chat_id)
+        broadcast_id = await store.create(["hello"])
+
+        bot = FakeBot(fail={3: 2, 7: -1})  # 3 — временный сбой, 7 — недоступен весь запуск
+        await broadcaster(bot, store).run(broadcast_id, ["hello"])
+        assert sorted(bot.sent) == [1, 2, 3, 4, 5, 6, 8, 9, 10]
+        assert await store.recipients(broadcast_id) == [7]  # рассылка не закрыта
+
+        bot.fail.clear()
+        await broadcaster(bot, store).resume()
+        assert Counter(bot.sent) == Counter(range(1, 11))
+        assert await store.pending() == []
+        await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_send_waits_out_flood_wait(tmp_path):
+    async def scenario():
+        store = BroadcastStore(str(tmp_path / "broadcast.sqlite3"))
+
+        class FloodBot(FakeBot):
+            flooded = False
+
+            async def send_message(self, chat_id, text, **kwargs):
+                if not self.flooded:
+                    self.flooded = True
+                    raise TelegramRetryAfter(SendMessage(chat_id=chat_id, text=text), "Flood control exceeded", 0.05)
+                await super().send_message(chat_id, text, **kwargs)
+
+        bot = FloodBot()
+        started = time.monotonic()
+        assert await broadcaster(bot, store).send(5, ["header", "card"]) is True
+        assert bot.sent == [5, 5]
+        assert time.monotonic() - started >= 0.05  # повтор — только после паузы
+        await store.close()
+
+    asyncio.run(scenario())
+
+
+def test_rejected_message_does_not_abandon_recipient(tmp_path):
+    async def scenario():
+        store = BroadcastStore(str(tmp_path / "broadcast.sqlite3"))
+        for chat_id in range(1, 4):
+            await store.subscribe(chat_id)
+        messages = ["header", {"id": 1, "caption": "bad card"}, "footer"]
+        broadcast_id = await store.create(messages)
+        bot = FakeBot()
+
+        async def card_sender(chat_id, card, **kwargs):
+            raise TelegramBadRequest(SendMessage(chat_id=chat_id, text=card["caption"]),
+                                     "Bad Request: message caption is too long")
+
+        sender = Broadcaster(bot, store, rate=1e6, per_chat_rate=1e6, card_sender=card_sender, retry_delay=0)
+        await sender.run(broadcast_id, messages)
+        assert Counter(bot.sent) == Counter({1: 2, 2: 2, 3: 2})  # header и footer каждому
+        assert await store.pending() == []
+        assert await store.subscribers_count() == 3  # никто не отписан
+        await store.close()
+
+    asyncio.run(scenario())
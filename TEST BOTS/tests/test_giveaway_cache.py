@@ -0,0 +1,30 @@
+import asyncio
+import gc
+import logging
+
+from giveaway_cache import GiveawayCache
+
+
+def test_background_refresh_error_is_logged_and_stale_value_kept(caplog):
+    async def scenario():
+        calls = []
+
+        async def loader():
+            calls.append(1)
+            if len(calls) > 1:
+                raise ConnectionError("GamerPower недоступен")
+            return ["game"]
+
+        cache = GiveawayCache(loader, ttl=0)
+        assert await cache.refresh() == ["game"]
+        assert await cache.get() == ["game"]  # устарело — старое значение, загрузка в фоне
+        await asyncio.sleep(0.01)
+        assert len(calls) == 2
+        assert cache.value == ["game"]
+
+    with caplog.at_level(logging.ERROR):
+        asyncio.run(scenario())
+        gc.collect()
+    messages = [record.getMessage() for record in caplog.records]
+    assert any("GamerPower недоступен" in m and "кэша" in m for m in messages)
+    assert not any("never retrieved" in m for m in messages)
@@ -0,0 +1,51 @@
+import asyncio
+
+from aiogram.exceptions import TelegramBadRequest
+from aiogram.methods import SendPhoto
+from aiogram.types import BufferedInputFile, Message
+
+from giveaway_images import FileIdStore, PhotoCards
+
+CARD = {"id": 1, "image": "https://example.com/1.jpg", "caption": "Game"}
+
+
+class FakeClient:
+    async def get_bytes(self, url):
+        return 200, b"jpeg"
+
+
+class FakeBot:
+    """send_photo не принимает file_id "stale" (как устаревший file_id); загрузка получает "fresh" """
+
+    def __init__(self):
+        self.photos: list[str] = []
+        self.texts: list[str] = []
+
+    async def send_photo(self, chat_id, photo, caption=None, **kwargs):
+        if photo == "stale":
+            raise TelegramBadRequest(SendPhoto(chat_id=chat_id, photo=photo), "Bad Request: wrong file identifier")
+        self.photos.append("upload" if isinstance(photo, BufferedInputFile) else photo)
+        return Message.model_validate({
+            "message_id": len(self.photos), "date": 0, "chat": {"id": chat_id, "type": "private"},
+            "photo": [{"file_id": "fresh", "file_unique_id": "u1", "width": 640, "height": 360}],
+        })
+
+    async def send_message(self, chat_id, text, **kwargs):
+        self.texts.append(text)
+
+
+def test_rejected_file_id_is_dropped_and_uploaded_again(tmp_path):
+    async def scenario():
+        store = FileIdStore(str(tmp_path / "images.sqlite3"))
+        await store.put(1, "stale")
+        bot = FakeBot()
+        cards = PhotoCards(bot, FakeClient(), store)
+        await cards.send(7, CARD)
+        await cards.send(8, CARD)
+        assert bot.photos == ["upload", "fresh"]
+        assert bot.texts == []
+        await store.load()
+        assert store.get(1) == "fresh"  # и в базе
+        await store.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+import asyncio
+
+from giveaway_poller import GiveawayPoller, Source
+
+GAME = {"id": 1, "title": "Game"}
+
+
+class FakeClient:
+    """Отвечает 200 на первый запрос и 304 на все следующие — как GamerPower с ETag"""
+
+    def __init__(self, data):
+        self.data = data
+        self.seen: set[str] = set()
+
+    async def get_json(self, url):
+        if url in self.seen:
+            return 304, self.data
+        self.seen.add(url)
+        return 200, self.data
+
+
+def test_fetch_all_passes_changes_to_on_update():
+    # /info забирает новый список первым: плановый опрос получит 304 и изменения не увидит
+    async def scenario():
+        updates = []
+
+        async def on_update(games):
+            updates.append(games)
+
+        source = Source("epic", "https://example.com/epic")
+        poller = GiveawayPoller(FakeClient([GAME]), [source], on_update=on_update)
+        assert await poller.fetch_all() == [GAME]
+        assert updates == [[GAME]]
+        assert await poller.poll(source) is False
+        assert await poller.fetch_all() == [GAME]
+        assert updates == [[GAME]]  # без изменений on_update не вызывается
+
+    asyncio.run(scenario())
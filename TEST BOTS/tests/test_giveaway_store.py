@@ -0,0 +1,29 @@
+import asyncio
+
+import giveaway_store
+from giveaway_store import SqliteSeenStore, keep_fresh
+
+
+def test_expiry_counts_from_last_seen_and_prune_repeats(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(giveaway_store.time, "time", lambda: now[0])
+
+    async def scenario():
+        store = SqliteSeenStore(str(tmp_path / "seen.sqlite3"), ttl=100, legacy_json=None)
+        await store.add_many([1, 2])
+        now[0] = 1080
+        await store.add_many([1])  # раздача 1 снова пришла из API — срок продлевается
+        now[0] = 1150
+        live = [1]
+        task = asyncio.create_task(keep_fresh(store, lambda: live, interval=0.01))
+        await asyncio.sleep(0.05)
+        assert await store.load() == {1}  # 2 удалена без перезапуска, 1 ещё идёт
+
+        live.clear()  # раздача 1 закончилась
+        now[0] = 1400
+        await asyncio.sleep(0.05)
+        task.cancel()
+        assert await store.load() == set()
+        await store.close()
+
+    asyncio.run(scenario())
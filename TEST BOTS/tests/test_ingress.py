@@ -0,0 +1,37 @@
+import asyncio
+
+from aiogram.types import Update, User
+
+from ingress import IngressGate
+
+USER = User(id=1, is_bot=False, first_name="user")
+
+
+def inline_update(update_id: int, query: str) -> Update:
+    return Update.model_validate({"update_id": update_id, "inline_query": {
+        "id": str(update_id), "from": {"id": USER.id, "is_bot": False, "first_name": "user"},
+        "query": query, "offset": "",
+    }})
+
+
+def test_inline_burst_answers_last_query():
+    # набор "witcher" по буквам и правки — 16 запросов быстрее лимита пользователя
+    async def scenario():
+        gate = IngressGate(rate=1, burst=5)
+        answered = []
+
+        async def handler(update, data):
+            await asyncio.sleep(0.01)
+            answered.append(update.inline_query.query)
+
+        queries = [f"witcher {i}" for i in range(16)]
+        await asyncio.gather(*(
+            gate(handler, inline_update(i, query), {"event_from_user": USER})
+            for i, query in enumerate(queries)
+        ))
+        assert answered[-1] == queries[-1]
+        assert answered == [queries[0], queries[-1]]  # промежуточные вытеснены свежим
+        assert gate.dropped == {"coalesced": 14, "rate_limited": 0, "shed": 0}
+        assert gate.depth == 0 and not gate._latest
+
+    asyncio.run(scenario())
@@ -0,0 +1,67 @@
+import asyncio
+
+from leaderboard import Leaderboard
+from user_storage import SqliteUserBackend, UserState
+
+
+def test_boards_and_names_survive_restart(tmp_path):
+    path = str(tmp_path / "users.sqlite3")
+
+    async def scenario():
+        board = Leaderboard(path, min_games=2)
+        board.record(1, UserState(total_games=1, wins=1), won=True, name="Анна")
+        board.record(2, UserState(total_games=1, wins=0), won=False, name="Борис")
+        board.record(2, UserState(total_games=2, wins=1), won=True)
+        await board.close()
+
+        board = Leaderboard(path, min_games=2)  # перезапуск: в памяти ничего нет
+        wins = await board.top("wins")
+        assert [(r.user_id, r.name, r.wins, r.games) for r in wins] == [(2, "Борис", 1, 2), (1, "Анна", 1, 1)]
+        assert [r.user_id for r in await board.top("rate")] == [2]  # у игрока 1 меньше min_games
+        for period in ("day", "week"):
+            assert [(r.name, r.wins, r.games) for r in await board.top(period)] == [("Борис", 1, 2), ("Анна", 1, 1)]
+        assert await board.rank("wins", 1) == (2, 2)
+        assert await board.rank("rate", 1) is None
+        assert await board.top("wins", 1) == wins[:1]
+        await board.close()
+
+    asyncio.run(scenario())
+
+
+def test_backfill_from_saved_players(tmp_path):
+    path = str(tmp_path / "users.sqlite3")
+
+    async def scenario():
+        backend = SqliteUserBackend(path)
+        await backend.save_many({1: UserState(total_games=3, wins=1), 2: UserState(), 3: UserState(total_games=4, wins=4)})
+        await backend.close()
+
+        board = Leaderboard(path, min_games=2)
+        assert [(r.user_id, r.wins, r.games) for r in await board.top("wins")] == [(3, 4, 4), (1, 1, 3)]
+        assert await board.rank("rate", 1) == (2, 2)
+        await board.close()
+
+    asyncio.run(scenario())
+
+
+def test_totals_are_counted_on_write_and_rank_is_capped(tmp_path):
+    path = str(tmp_path / "users.sqlite3")
+
+    async def scenario():
+        board = Leaderboard(path, min_games=2, rank_limit=3)
+        for user_id in range(1, 7):
+            board.record(user_id, UserState(total_games=1, wins=user_id % 2), won=bool(user_id % 2))
+        assert await board.rank("wins", 1) == (3, 6)  # при равенстве выше больший user_id: 5, 3, 1
+        assert await board.rank("wins", 2) == (None, 6)  # дальше rank_limit
+        assert await board.rank("rate", 1) is None
+        board.record(2, UserState(total_games=2, wins=1), won=True)  # набрал min_games — попал в rate
+        assert await board.rank("rate", 2) == (1, 1)
+        assert await board.rank("day", 2) == (1, 6)
+        await board.close()
+
+        board = Leaderboard(path, min_games=2, rank_limit=3)  # счётчики хранятся в базе
+        assert await board.rank("week", 6) == (None, 6)
+        assert await board.rank("rate", 2) == (1, 1)
+        await board.close()
+
+    asyncio.run(scenario())
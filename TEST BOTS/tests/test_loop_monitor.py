@@ -0,0 +1,31 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message, Update
+
+from loop_monitor import setup_loop_monitor
+from metrics import setup_metrics
+
+
+def test_metrics_and_monitor_share_one_handler_timer():
+    async def scenario():
+        bot = Bot("123:ABC")
+        dp = Dispatcher()
+
+        async def echo(message: Message):
+            pass
+
+        dp.message.register(echo)
+        metrics = setup_metrics(dp, bot)
+        monitor = setup_loop_monitor(dp)
+        assert len(dp.message.middleware) == 1
+
+        update = Update.model_validate({"update_id": 1, "message": {
+            "message_id": 1, "date": 0, "chat": {"id": 7, "type": "private"}, "text": "hi",
+        }})
+        await dp.feed_update(bot, update)
+        assert monitor.handlers["echo"][0] == 1
+        assert 'bot_handler_seconds_count{handler="echo"} 1' in metrics.render()
+        await bot.session.close()
+
+    asyncio.run(scenario())
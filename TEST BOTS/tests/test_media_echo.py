@@ -0,0 +1,48 @@
+import asyncio
+
+from aiogram.methods import SendPhoto
+from aiogram.types import Message
+
+from media_echo import MediaEcho
+
+
+class FakeBot:
+    """Запоминает, чем отправлено каждое фото; в ответе — новый file_id, как у Telegram"""
+    id = 42
+
+    def __init__(self):
+        self.sent: list[str] = []
+
+    async def __call__(self, method, request_timeout=None):
+        assert isinstance(method, SendPhoto)
+        self.sent.append(method.photo)
+        return Message.model_validate({
+            "message_id": 1000 + len(self.sent),
+            "date": 0,
+            "chat": {"id": method.chat_id, "type": "private"},
+            "photo": [{"file_id": f"sent-{len(self.sent)}", "file_unique_id": "small", "width": 320, "height": 240}],
+        }, context={"bot": self})
+
+
+def photo_message(bot, message_id: int) -> Message:
+    return Message.model_validate({
+        "message_id": message_id,
+        "date": 0,
+        "chat": {"id": 7, "type": "private"},
+        "photo": [
+            {"file_id": "in-small", "file_unique_id": "small", "width": 320, "height": 240},
+            {"file_id": "in-large", "file_unique_id": "large", "width": 1280, "height": 960},
+        ],
+    }, context={"bot": bot})
+
+
+def test_second_send_reuses_file_id_from_first_result():
+    async def scenario():
+        bot = FakeBot()
+        echo = MediaEcho(bot, photo_size=800)  # не "largest" — ответ идёт по file_id, не copy_message
+        await echo.handle(photo_message(bot, 1))
+        await echo.handle(photo_message(bot, 2))
+        assert bot.sent == ["in-small", "sent-1"]
+        assert echo.files.hits == 1
+
+    asyncio.run(scenario())
@@ -0,0 +1,71 @@
+import random
+import re
+
+from render import paginate, split_html
+
+TAGS = ("b", "i", "u", "s", "code", "tg-spoiler", 'a href="https://example.com/?a=1&amp;b=2"')
+WORDS = ("word", "слово", "&amp;", "&lt;tag&gt;", "💰", "\n", "")
+_TOKEN = re.compile(r"(<[^>]*>)|([^<]+)")
+
+
+def random_html(rng: random.Random, depth: int = 0) -> str:
+    out = []
+    for _ in range(rng.randint(1, 6)):
+        if depth < 4 and rng.random() < 0.35:
+            spec = rng.choice(TAGS)
+            out.append(f"<{spec}>{random_html(rng, depth + 1)}</{spec.split()[0]}>")
+        else:
+            words = [rng.choice(WORDS) or "x" * rng.randint(1, 60) for _ in range(rng.randint(1, 25))]
+            out.append(" ".join(words))
+    return "".join(out)
+
+
+def check_part(part: str, limit: int):
+    assert len(part) <= limit
+    stack = []
+    text = []
+    for tag, chunk in _TOKEN.findall(part):
+        if tag.startswith("</"):
+            assert stack and stack.pop() == tag[2:-1], part
+        elif tag:
+            stack.append(tag[1:-1].split()[0])
+        else:
+            text.append(chunk)
+            # сущности не разорваны
+            assert re.fullmatch(r"([^&]|&(amp|lt|gt|quot);)*", chunk), chunk
+    assert not stack, part
+    assert "".join(text).strip(), part  # без пустых частей и пар вроде <b></b>
+
+
+def visible(html: str) -> str:
+    return re.sub(r"\s+", "", re.sub(r"<[^>]*>", "", html))
+
+
+def test_split_html_parts_fit_and_are_well_formed():
+    rng = random.Random(4096)
+    for _ in range(1000):
+        html = random_html(rng)
+        limit = rng.randint(200, 600)  # больше любых четырёх вложенных тегов с закрывающими
+        parts = list(split_html(html, limit))
+        if len(html) <= limit:
+            assert parts == [html]
+            continue
+        for part in parts:
+            check_part(part, limit)
+        assert "".join(map(visible, parts)) == visible(html)
+
+
+def test_split_html_full_message_limit():
+    rng = random.Random(1)
+    for _ in range(50):
+        html = "".join(random_html(rng) for _ in range(40))
+        for part in split_html(html):
+            check_part(part, 4096)
+
+
+def test_paginate_respects_limit():
+    rng = random.Random(7)
+    chunks = [random_html(rng) for _ in range(200)]
+    pages = list(paginate(chunks, header="🎮 Header:\n\n", limit=500))
+    assert all(len(page) <= 500 for page in pages)
+    assert "".join(map(visible, pages)) == visible("🎮 Header:\n\n" + "".join(chunks))
@@ -0,0 +1,42 @@
+import asyncio
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Message, Update
+
+from loop_monitor import setup_loop_monitor
+from metrics import setup_metrics
+from routing import RoutingTable
+
+
+def message_update(update_id: int, text: str) -> Update:
+    return Update.model_validate({"update_id": update_id, "message": {
+        "message_id": update_id, "date": 0, "chat": {"id": 7, "type": "private"}, "text": text,
+    }})
+
+
+def test_timings_are_labelled_with_the_routed_handler():
+    async def scenario():
+        bot = Bot("123:ABC")
+        dp = Dispatcher()
+        routes = RoutingTable()
+
+        @routes.command("start")
+        async def process_start_command(message: Message, args: str | None):
+            pass
+
+        @routes.number(1, 100)
+        async def process_numbers_answer(message: Message, number: int):
+            pass
+
+        dp.message.register(routes.dispatch)
+        metrics = setup_metrics(dp, bot)
+        monitor = setup_loop_monitor(dp)
+        await dp.feed_update(bot, message_update(1, "/start"))
+        await dp.feed_update(bot, message_update(2, "42"))
+        assert sorted(monitor.handlers) == ["process_numbers_answer", "process_start_command"]
+        page = metrics.render()
+        assert 'bot_handler_seconds_count{handler="process_start_command"} 1' in page
+        assert 'handler="dispatch"' not in page
+        await bot.session.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,24 @@
+from aiogram.types import Update
+
+from shard_runtime import shard_key, update_payload
+
+USER = {"id": 42, "is_bot": False, "first_name": "user"}
+
+
+def dumped(update: dict) -> dict:
+    # так апдейт из getUpdates уходит в очередь шарда (Supervisor._poll)
+    return update_payload(Update.model_validate(update))
+
+
+def test_shard_key_of_dumped_updates_matches_raw_json():
+    updates = [
+        {"update_id": 1, "inline_query": {"id": "1", "from": USER, "query": "witcher", "offset": ""}},
+        {"update_id": 2, "callback_query": {"id": "2", "from": USER, "chat_instance": "x", "data": "top"}},
+        {"update_id": 3, "poll_answer": {"poll_id": "3", "user": USER, "option_ids": [0],
+                         "option_persistent_ids": ["a"]}},
+        {"update_id": 4, "message": {"message_id": 1, "date": 0, "chat": {"id": 7, "type": "private"},
+                                     "from": USER, "text": "hi"}},
+    ]
+    assert [shard_key(dumped(update)) for update in updates] == [42, 42, 42, 7]
+    assert [shard_key(update) for update in updates] == [42, 42, 42, 7]  # webhook — сырой JSON
+    assert Update.model_validate(dumped(updates[0])).inline_query.from_user.id == 42  # воркер читает обратно
@@ -0,0 +1,180 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from dataclasses import astuple, dataclass
+from typing import Protocol
+
+from sqlite_db import SqliteDB
+
+
+@dataclass(slots=True)
+class UserState:
+    """Состояние игрока: без __dict__, ~100 байт вместо словаря на пользователя"""
+    in_game: bool = False
+    secret_number: int | None = None
+    attempts: int | None = None
+    total_games: int = 0
+    wins: int = 0
+
+
+class UserBackend(Protocol):
+    """Долговременное хранилище состояний игроков"""
+
+    async def load(self, user_id: int) -> UserState | None: ...
+
+    async def save_many(self, items: dict[int, UserState]) -> None: ...
+
+    async def close(self) -> None: ...
+
+
+class SqliteUserBackend:
+    """Локальный бэкенд на SQLite (WAL), запросы выполняются вне event loop"""
+
+    def __init__(self, path: str = "users.sqlite3"):
+        self.path = path
+        self._db = SqliteDB(
+            path,
+            "CREATE TABLE IF NOT EXISTS users ("
+            " user_id INTEGER PRIMARY KEY,"
+            " in_game INTEGER NOT NULL,"
+            " secret_number INTEGER,"
+            " attempts INTEGER,"
+            " total_games INTEGER NOT NULL,"
+            " wins INTEGER NOT NULL)",
+        )
+
+    def _load(self, user_id: int) -> UserState | None:
+        rows = self._db.fetch(
+            "SELECT in_game, secret_number, attempts, total_games, wins FROM users WHERE user_id = ?", (user_id,),
+        )
+        if not rows:
+            return None
+        return UserState(bool(rows[0][0]), *rows[0][1:])
+
+    def _save_many(self, items: dict[int, UserState]):
+        self._db.execute(
+            "INSERT OR REPLACE INTO users VALUES (?, ?, ?, ?, ?, ?)",
+            [(user_id, *astuple(state)) for user_id, state in items.items()], many=True,
+        )
+
+    async def load(self, user_id: int) -> UserState | None:
+        return await asyncio.to_thread(self._load, user_id)
+
+    async def save_many(self, items: dict[int, UserState]) -> None:
+        await asyncio.to_thread(self._save_many, items)
+
+    async def close(self) -> None:
+        await self._db.close()
+
+
+class RedisUserBackend:
+    """Бэкенд на Redis (или совместимом сервере): один hash на пользователя"""
+
+    def __init__(self, url: str = "redis://localhost:6379/0", prefix: str = "guess:user:"):
+        try:
+            from redis import asyncio as aioredis
+        except ImportError as e:
+            raise ImportError("Для RedisUserBackend установите пакет redis: pip install redis") from e
+        self._redis = aioredis.from_url(url)
+        self.prefix = prefix
+
+    @staticmethod
+    def _unpack(data: dict) -> UserState:
+        get = lambda key: int(data[key]) if data.get(key, b"") != b"" else None
+        return UserState(bool(get(b"in_game")), get(b"secret_number"), get(b"attempts"),
+                         get(b"total_games") or 0, get(b"wins") or 0)
+
+    async def load(self, user_id: int) -> UserState | None:
+        data = await self._redis.hgetall(f"{self.prefix}{user_id}")
+        return self._unpack(data) if data else None
+
+    async def save_many(self, items: dict[int, UserState]) -> None:
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for user_id, state in items.items():
+                pipe.hset(f"{self.prefix}{user_id}", mapping={
+                    "in_game": int(state.in_game),
+                    "secret_number": "" if state.secret_number is None else state.secret_number,
+                    "attempts": "" if state.attempts is None else state.attempts,
+                    "total_games": state.total_games,
+                    "wins": state.wins,
+                })
+            await pipe.execute()
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+class UserStorage:
+    """Горячий LRU-кэш в памяти + отложенная пакетная запись (write-behind) в бэкенд"""
+
+    def __init__(self, backend: UserBackend, capacity: int = 100_000, flush_interval: float = 5):
+        self.backend = backend
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self._hot: OrderedDict[int, UserState] = OrderedDict()
+        # изменённые, но ещё не записанные; держим их здесь, даже если LRU их вытеснил
+        self._dirty: dict[int, UserState] = {}
+        self._flush_task: asyncio.Task | None = None
+
+    async def _lookup(self, user_id: int) -> UserState | None:
+        state = self._hot.get(user_id)
+        if state is not None:
+            self._hot.move_to_end(user_id)
+            return state
+        state = self._dirty.get(user_id)
+        if state is None:
+            state = await self.backend.load(user_id)
+            # пока ждали бэкенд, запись могла появиться из другого хэндлера
+            state = self._hot.get(user_id) or self._dirty.get(user_id) or state
+        if state is not None:
+            self._remember(user_id, state)
+        return state
+
+    def _remember(self, user_id: int, state: UserState):
+        self._hot[user_id] = state
+        self._hot.move_to_end(user_id)
+        while len(self._hot) > self.capacity:
+            self._hot.popitem(last=False)
+
+    async def get(self, user_id: int) -> UserState:
+        """Состояние игрока; новый игрок создаётся в памяти"""
+        state = await self._lookup(user_id)
+        if state is None:
+            state = UserState()
+            self._remember(user_id, state)
+        return state
+
+    async def peek(self, user_id: int) -> UserState:
+        """Как get, но для незнакомого пользователя ничего не сохраняет (например, для /stat)"""
+        return await self._lookup(user_id) or UserState()
+
+    def save(self, user_id: int, state: UserState):
+        """Отметить состояние изменённым — запишется при следующем сбросе"""
+        self._dirty[user_id] = state
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        try:
+            await self.backend.save_many(batch)
+        except Exception as e:
+            logging.error(f"Ошибка записи состояний игроков: {e}")
+            # вернуть несохранённое, не затирая более свежие изменения
+            self._dirty = {**batch, **self._dirty}
+
+    async def _flush_loop(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def start(self):
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self):
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        await self.flush()
+        await self.backend.close()